@@ -0,0 +1,429 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import hashlib
+import json
+from copy import deepcopy
+from io import BytesIO
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Union
+
+from munch import Munch
+from munch import munchify
+from munch import unmunchify
+from viktor import File
+from viktor import UserError
+from viktor.api_v1 import Entity
+from viktor.core import Storage
+from viktor.external.generic import GenericAnalysis
+
+from app.embankment.artifacts import add_known_artifacts
+from app.embankment.artifacts import get_artifact_hash
+from app.embankment.artifacts import get_job_files
+from app.embankment.artifacts import get_known_artifacts
+from app.embankment.artifacts import get_plaxis_script
+from app.embankment.constants import DEFAULT_STAGING
+from app.embankment.constants import MAX_PARALLEL_ANALYSES
+from app.embankment.constants import PHASE_KEYS
+from app.embankment.constants import WORKER_CAPACITY
+from app.embankment.dependencies import add_dependencies
+from app.embankment.dependencies import get_material_hashes
+from app.embankment.dependencies import get_material_properties
+from app.embankment.domain import get_drain_errors
+from app.embankment.domain import get_soil_width
+from app.embankment.metrics import METRICS_VERSION
+from app.embankment.metrics import get_consolidation_metrics
+from app.embankment.runtime import add_runtime_records
+from app.embankment.runtime import get_runtime_features
+from app.embankment.runtime import get_runtime_records
+from app.embankment.runtime import get_timed_out_duration
+from app.embankment.runtime import get_timeout
+from app.embankment.runtime import predict_runtime
+from app.embankment.scheduler import Priority
+from app.embankment.scheduler import ScheduledJob
+from app.embankment.scheduler import get_job_priority
+from app.embankment.scheduler import run_scheduled
+from app.embankment.scheduler import wait_for_analysis
+from app.embankment.surrogate import add_dataset_records
+from app.embankment.surrogate import get_surrogate_features
+from app.embankment.surrogate import resample_curve
+
+RESULT_STORAGE_KEY = "plaxis_result"
+PROJECT_STORAGE_KEY = "plaxis_project"
+PROJECT_INFO_STORAGE_KEY = "plaxis_project_info"
+
+
+class AnalysisJob(NamedTuple):
+    """Input of a PLAXIS analysis of an embankment entity (None for the current entity)"""
+
+    entity: Optional[Entity]
+    input_hash: str
+    json_input: str
+    json_materials: str
+    entity_id: Optional[int] = None  # Used by the scheduler to supersede waiting jobs of the same entity
+    max_cores: Optional[int] = None  # Cores per calculation, which does not change the result (None for automatic)
+    material_hashes: Optional[Dict[int, str]] = None  # Revisions of the used materials, keyed by material entity id
+
+
+def get_effective_staging(staging: Munch) -> dict:
+    """Remove the time intervals of phases that do not use them, such that changing these does not lead to a
+    recalculation"""
+    staging_ = unmunchify(staging)
+    for phase_staging in staging_.values():
+        if phase_staging.get("loading_type", "Staged construction") != "Staged construction":
+            phase_staging.pop("time_interval", None)
+    return staging_
+
+
+def get_calculation_settings(calculation: Optional[Munch]) -> dict:
+    """Solver type and iteration limits per phase that are set by the user. Settings left empty use the defaults of
+    PLAXIS, and are left out such that they do not change the input hash"""
+    calculation = calculation or Munch()
+    settings = {}
+    if (calculation.get("solver") or {}).get("solver"):
+        settings["solver"] = calculation.solver.solver
+    for phase_key in PHASE_KEYS:
+        phase_limits = {key: value for key, value in (calculation.get(phase_key) or {}).items() if value is not None}
+        if phase_limits:
+            settings[phase_key] = phase_limits
+    return settings
+
+
+def has_selected_materials(params: Munch) -> bool:
+    """Whether the materials of the embankment and of all soil layers have been selected"""
+    materials = [params.geometry_tab.embankment.material] + [
+        layer.material for layer in params.geometry_tab.soil.layers
+    ]
+    return all(material is not None for material in materials)
+
+
+def get_worker_input(params: Munch) -> Tuple[str, str]:
+    """Preprocess the embankment params to the JSON input and materials payloads that are sent to the worker"""
+    if not has_selected_materials(params):
+        raise UserError("Select the material of the embankment and of each soil layer")
+    drain_errors = get_drain_errors(params.geometry_tab)
+    if drain_errors:  # Checked before the analysis is queued, as the worker would only fail on them
+        raise UserError(". ".join(drain_errors))
+    params_ = deepcopy(params)
+    params_materials_list = [get_material_properties(params_.geometry_tab.embankment.material.last_saved_params)]
+    # Preprocess params: replace all material IDs with the name of the material
+    params_.geometry_tab.embankment.material = {
+        "name": params_.geometry_tab.embankment.material.last_saved_params.general.MaterialName
+    }
+    for layer in params_.geometry_tab.soil.layers:
+        params_materials_list.append(get_material_properties(layer.material.last_saved_params))
+        layer.material = {"name": layer.material.last_saved_params.general.MaterialName}
+    # Replace the automatic width by its value, such that the worker input only depends on the resulting model
+    params_.geometry_tab.soil.width = get_soil_width(params_.geometry_tab)
+    params_.geometry_tab.soil.pop("auto_width", None)
+    params_.geometry_tab.soil.pop("boundary_tolerance", None)
+    # Only the geometry, staging and calculation settings are used by the worker, so changing e.g. plot settings does
+    # not invalidate results
+    worker_input = {
+        "geometry_tab": unmunchify(params_.geometry_tab),
+        "staging_tab": get_effective_staging(params_.get("staging_tab") or DEFAULT_STAGING),
+    }
+    calculation_settings = get_calculation_settings(params_.get("calculation_tab"))
+    if calculation_settings:
+        worker_input["calculation_tab"] = calculation_settings
+    json_input = json.dumps(worker_input, sort_keys=True)
+    json_materials = json.dumps(params_materials_list, sort_keys=True)
+    return json_input, json_materials
+
+
+def get_input_hash(json_input: str, json_materials: str) -> str:
+    """Hash of the worker input, used to recognise designs that have been analysed before"""
+    return hashlib.sha256(f"{json_input}\n{json_materials}".encode()).hexdigest()
+
+
+def get_model_hash(json_input: str, json_materials: str) -> str:
+    """Hash of the part of the worker input that defines the model before staging, i.e. the geometry and materials"""
+    geometry = json.dumps(json.loads(json_input)["geometry_tab"], sort_keys=True)
+    return get_input_hash(geometry, json_materials)
+
+
+def prepare_job(params: Munch, entity: Entity = None, entity_id: int = None) -> AnalysisJob:
+    """Preprocess the params of an embankment to an analysis job"""
+    json_input, json_materials = get_worker_input(params)
+    entity_id = entity.id if entity is not None else entity_id
+    max_cores = ((params.get("calculation_tab") or {}).get("solver") or {}).get("max_cores")
+    return AnalysisJob(
+        entity,
+        get_input_hash(json_input, json_materials),
+        json_input,
+        json_materials,
+        entity_id,
+        max_cores,
+        get_material_hashes(params),
+    )
+
+
+def get_phase_settings(staging: dict, calculation: dict) -> dict:
+    """Settings of each calculation phase: the staging and the iteration limits"""
+    return {phase_key: {**staging.get(phase_key, {}), **calculation.get(phase_key, {})} for phase_key in PHASE_KEYS}
+
+
+def get_first_changed_phase(staging: dict, calculated_staging: dict) -> int:
+    """Index of the first phase of which the staging differs from an earlier calculation. All phases after this phase
+    depend on it, so these have to be recalculated as well"""
+    for index, phase_key in enumerate(PHASE_KEYS):
+        if staging.get(phase_key) != calculated_staging.get(phase_key):
+            return index
+    return len(PHASE_KEYS)
+
+
+def get_job_artifacts(job: AnalysisJob) -> Tuple[Dict[str, bytes], int]:
+    """Return the job files that can be cached by the worker, and the index of the first phase that has to be
+    calculated.
+
+    If a PLAXIS project of the same model was saved in an earlier run, it is sent along such that the worker only
+    recalculates the phases of which the staging has changed.
+    """
+    artifacts = {"materials.json": job.json_materials.encode()}
+    try:
+        project_info = json.loads(Storage().get(PROJECT_INFO_STORAGE_KEY, scope="entity", entity=job.entity).getvalue())
+    except FileNotFoundError:
+        return artifacts, 0
+    if project_info["model_hash"] != get_model_hash(job.json_input, job.json_materials):
+        return artifacts, 0
+    worker_input = json.loads(job.json_input)
+    calculation = worker_input.get("calculation_tab", {})
+    calculated_calculation = project_info.get("calculation", {})
+    if calculation.get("solver") != calculated_calculation.get("solver"):
+        recalculate_from_phase = 0
+    else:
+        recalculate_from_phase = get_first_changed_phase(
+            get_phase_settings(worker_input["staging_tab"], calculation),
+            get_phase_settings(project_info["staging"], calculated_calculation),
+        )
+    project = Storage().get(PROJECT_STORAGE_KEY, scope="entity", entity=job.entity)
+    artifacts["baseline_project.zip"] = project.getvalue_binary()
+    return artifacts, recalculate_from_phase
+
+
+def run_analysis(files: List[Tuple[str, BytesIO]], timeout: int) -> Tuple[dict, Optional[File]]:
+    """Send the input files to the PLAXIS worker and return the loaded output and the saved PLAXIS project"""
+    generic_analysis = GenericAnalysis(
+        files=files, output_filenames=["output.json", "project.zip"], executable_key="plaxis"
+    )
+    generic_analysis.execute(timeout=timeout)
+    output_file = generic_analysis.get_output_file("output.json")
+    project_file = generic_analysis.get_output_file("project.zip", as_file=True)
+    return json.load(output_file), project_file
+
+
+def run_job(
+    job: AnalysisJob, artifacts: Dict[str, bytes], recalculate_from_phase: int, known_artifacts: Set[str], timeout: int
+) -> Tuple[dict, Optional[File]]:
+    """Run an analysis job, referring to the artifacts that the worker is known to have by their hash. If the worker
+    that picks up the job does not have them, the job is sent again with all files"""
+    files = {"input.json": job.json_input.encode(), "plaxis.py": get_plaxis_script()}
+    # The worker divides its cores between the analyses that it runs at the same time, unless the cores are set
+    files["calculation.json"] = json.dumps({"max_cores": job.max_cores, "concurrency": WORKER_CAPACITY}).encode()
+    if "baseline_project.zip" in artifacts:
+        files["job.json"] = json.dumps({"recalculate_from_phase": recalculate_from_phase}).encode()
+    output, project = run_analysis(get_job_files(files, artifacts, known_artifacts), timeout)
+    if "missing_artifacts" in output:
+        output, project = run_analysis(get_job_files(files, artifacts, set()), timeout)
+    return output, project
+
+
+def get_stored_result(job: AnalysisJob) -> Optional[dict]:
+    """Return the stored output of an entity if it was obtained with the same input, otherwise None"""
+    try:
+        stored_file = Storage().get(RESULT_STORAGE_KEY, scope="entity", entity=job.entity)
+    except FileNotFoundError:
+        return None
+    stored_result = json.loads(stored_file.getvalue())
+    if stored_result["input_hash"] != job.input_hash:
+        return None
+    output = stored_result["output"]
+    if output.get("metrics", {}).get("version") != METRICS_VERSION:  # Stored with an earlier version of the metrics
+        output["metrics"] = get_consolidation_metrics(output)
+    return output
+
+
+def store_result(job: AnalysisJob, output: dict, project: Optional[File]) -> None:
+    """Store the output of an analysis on the entity, together with the hash of the input it belongs to. The saved
+    PLAXIS project is stored as well, to be reused when only the staging changes"""
+    stored_result = {"input_hash": job.input_hash, "output": output}
+    Storage().set(RESULT_STORAGE_KEY, data=File.from_data(json.dumps(stored_result)), scope="entity", entity=job.entity)
+    if project is not None:
+        worker_input = json.loads(job.json_input)
+        project_info = {
+            "model_hash": get_model_hash(job.json_input, job.json_materials),
+            "staging": worker_input["staging_tab"],
+            "calculation": worker_input.get("calculation_tab", {}),
+        }
+        Storage().set(PROJECT_STORAGE_KEY, data=project, scope="entity", entity=job.entity)
+        Storage().set(
+            PROJECT_INFO_STORAGE_KEY, data=File.from_data(json.dumps(project_info)), scope="entity", entity=job.entity
+        )
+
+
+def delete_stored_result(entity: Entity) -> None:
+    """Delete the stored output and saved PLAXIS project of an entity, e.g. because a material it used has changed"""
+    stored_keys = Storage().list(prefix="plaxis_", scope="entity", entity=entity)
+    for key in (RESULT_STORAGE_KEY, PROJECT_STORAGE_KEY, PROJECT_INFO_STORAGE_KEY):
+        if key in stored_keys:
+            Storage().delete(key, scope="entity", entity=entity)
+
+
+def _store_outputs(
+    job_arguments: List[tuple], features: List[List[float]], results: List[Union[tuple, Exception, None]]
+) -> List[Optional[dict]]:
+    """Store the results of the finished jobs and record what later analyses learn from them, see run_jobs. Return
+    the outputs, or raise the first error once the results of the other jobs are stored"""
+    outputs = []
+    errors = []
+    for (job, *_), result in zip(job_arguments, results):
+        if isinstance(result, Exception):
+            errors.append(result)
+            outputs.append(None)
+            continue
+        if result is None:  # Superseded by a newer job of the same entity
+            outputs.append(None)
+            continue
+        output, project = result
+        output["metrics"] = get_consolidation_metrics(output)  # Stored with the result, so curves are processed once
+        store_result(job, output, project)
+        outputs.append(output)
+    finished = [index for index, output in enumerate(outputs) if output is not None]
+    jobs = [job_arguments[index][0] for index in finished]
+    # Record which material revisions the stored results depend on, such that these can be invalidated
+    add_dependencies([(job.entity_id, job.material_hashes) for job in jobs if job.entity_id is not None])
+    # The worker caches the artifacts of these jobs and the projects that it saved, so later jobs can refer to them by
+    # their hash
+    add_known_artifacts(
+        [get_artifact_hash(content) for index in finished for content in job_arguments[index][1].values()]
+        + [
+            get_artifact_hash(results[index][1].getvalue_binary())
+            for index in finished
+            if results[index][1] is not None
+        ]
+    )
+    # Record the run times that the worker reported, for the next run time predictions. Analyses that were killed at
+    # their timeout are recorded as censored runs, which took at least the timeout
+    add_runtime_records(
+        [
+            {"features": features[index], "duration": outputs[index]["duration"]}
+            for index in finished
+            if "duration" in outputs[index]
+        ]
+        + [
+            {"features": features[index], "duration": job_arguments[index][4], "censored": True}
+            for index, result in enumerate(results)
+            if isinstance(result, TimeoutError)
+        ]
+    )
+    # Add the results to the dataset of the surrogate model
+    add_dataset_records(
+        [
+            {
+                "input_hash": job.input_hash,
+                "features": get_surrogate_features(job.json_input, job.json_materials),
+                "p_excess": resample_curve(outputs[index]["time"], outputs[index]["p_excess"]).tolist(),
+            }
+            for index, job in zip(finished, jobs)
+        ]
+    )
+    if errors:
+        raise errors[0]
+    return outputs
+
+
+def run_jobs(jobs: List[AnalysisJob], priority: Priority = Priority.ANALYSIS) -> List[Optional[dict]]:
+    """Dispatch the analysis jobs to the worker in parallel once the scheduler admits them, store the results and
+    return the outputs. The output of a job that was superseded while waiting in the queue is None. If jobs failed,
+    the results of the other jobs are stored before the first error is raised"""
+    records = get_runtime_records()
+    known_artifacts = get_known_artifacts()
+    job_arguments = []
+    features = []
+    scheduled_jobs = []
+    for job in jobs:  # Storage is only accessed from the main thread
+        artifacts, recalculate_from_phase = get_job_artifacts(job)
+        job_features = get_runtime_features(
+            munchify(json.loads(job.json_input)["geometry_tab"]), len(PHASE_KEYS) - recalculate_from_phase
+        )
+        prediction, std = predict_runtime(job_features, records)
+        job_arguments.append(
+            (
+                job,
+                artifacts,
+                recalculate_from_phase,
+                known_artifacts,
+                get_timeout(prediction, std, get_timed_out_duration(job_features, records)),
+            )
+        )
+        features.append(job_features)
+        scheduled_jobs.append(ScheduledJob(job.entity_id, job.input_hash, get_job_priority(priority, prediction)))
+    if len(jobs) == 1:
+        message = f"Running PLAXIS analysis, expected run time is {prediction / 60:.0f} minutes"
+    else:
+        message = f"Running {len(jobs)} PLAXIS analyses"
+    results = run_scheduled(
+        scheduled_jobs, lambda index: run_job(*job_arguments[index]), MAX_PARALLEL_ANALYSES, message
+    )
+    return _store_outputs(job_arguments, features, results)
+
+
+def get_result(params: Munch, entity: Entity = None, entity_id: int = None) -> dict:
+    """Return the PLAXIS output for the params, running an analysis only if no stored result is available"""
+    job = prepare_job(params, entity, entity_id)
+    output = get_stored_result(job)
+    if output is None and job.entity_id is not None:
+        # Reuse the result of an analysis of the same design that is already running, e.g. of the comparison view
+        wait_for_analysis(job.entity_id, job.input_hash, Priority.ANALYSIS)
+        output = get_stored_result(job)
+    if output is None:
+        output = run_jobs([job])[0]
+    if output is None:
+        raise UserError("The analysis was superseded by a newer analysis of this embankment")
+    return output
+
+
+def get_results(entities: List[Entity], priority: Priority = Priority.BATCH) -> Dict[int, dict]:
+    """Return the PLAXIS output of multiple embankment entities, keyed by entity id.
+
+    Stored results are reused; the analyses of the remaining entities are dispatched to the worker in parallel, as a
+    batch. When an analysis is taken over while waiting in the queue, e.g. by the PLAXIS analysis view of another user,
+    its stored result is read once the taking-over analysis has finished. Entities of which the analysis was
+    superseded by an analysis of a different input are left out.
+    """
+    results = {}
+    pending = []
+    for entity in entities:
+        job = prepare_job(entity.last_saved_params, entity)
+        output = get_stored_result(job)
+        if output is None:
+            pending.append(job)
+        else:
+            results[entity.id] = output
+    if pending:
+        for job, output in zip(pending, run_jobs(pending, priority)):
+            if output is None:
+                wait_for_analysis(job.entity_id, job.input_hash, priority)
+                output = get_stored_result(job)
+            if output is not None:
+                results[job.entity.id] = output
+    return results
@@ -0,0 +1,82 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import hashlib
+import json
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Set
+from typing import Tuple
+
+from viktor import File
+from viktor.core import Storage
+
+ARTIFACTS_STORAGE_KEY = "worker_artifacts"
+MAX_KNOWN_ARTIFACTS = 1000
+
+
+@lru_cache(maxsize=1)
+def get_plaxis_script() -> bytes:
+    """The worker script. It is the executable of the job, so it is always sent, but only read from disk once"""
+    return File.from_path(Path(__file__).parents[1] / "lib" / "plaxis.py").getvalue_binary()
+
+
+def get_artifact_hash(content: bytes) -> str:
+    """Content address of a job file"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def get_known_artifacts() -> Set[str]:
+    """Hashes of the job files that have been sent to the worker before, and are likely in its artifact cache"""
+    try:
+        return set(json.loads(Storage().get(ARTIFACTS_STORAGE_KEY, scope="workspace").getvalue()))
+    except FileNotFoundError:
+        return set()
+
+
+def add_known_artifacts(hashes: Iterable[str]) -> None:
+    """Record that job files have been sent to or created by the worker"""
+    hashes = list(hashes)
+    new_hashes = set(hashes)
+    known_artifacts = [artifact for artifact in get_known_artifacts() if artifact not in new_hashes] + hashes
+    known_artifacts = known_artifacts[-MAX_KNOWN_ARTIFACTS:]
+    Storage().set(ARTIFACTS_STORAGE_KEY, data=File.from_data(json.dumps(known_artifacts)), scope="workspace")
+
+
+def get_job_files(
+    files: Dict[str, bytes], artifacts: Dict[str, bytes], known_artifacts: Set[str]
+) -> List[Tuple[str, BytesIO]]:
+    """Files to send to the worker. The artifacts are listed by content hash in artifacts.json, and are only sent if
+    the worker is not known to have them in its artifact cache
+
+    :param files: files that are always sent, keyed by file name
+    :param artifacts: files that can be referenced by their hash, keyed by file name
+    :param known_artifacts: hashes of the files that the worker is known to have
+    """
+    artifact_hashes = {file_name: get_artifact_hash(content) for file_name, content in artifacts.items()}
+    job_files = [(file_name, BytesIO(content)) for file_name, content in files.items()]
+    job_files.append(("artifacts.json", BytesIO(json.dumps(artifact_hashes).encode())))
+    job_files.extend(
+        (file_name, BytesIO(content))
+        for file_name, content in artifacts.items()
+        if artifact_hashes[file_name] not in known_artifacts
+    )
+    return job_files
@@ -26,3 +26,31 @@ COLORS = {
     "blue": Color.blue(),
     "yellow": Color.viktor_yellow(),
 }
+
+# Number of PLAXIS analyses that are dispatched to the worker at the same time
+MAX_PARALLEL_ANALYSES = 4
+# Number of PLAXIS analyses that the worker runs at the same time, for all users of the workspace together
+WORKER_CAPACITY = 4
+# Default total number of points that is sent to the browser for a P_excess plot
+MAX_PLOT_POINTS = 2000
+# Plots with more points than this are drawn using WebGL
+WEBGL_THRESHOLD = 1000
+
+# Names of the phases in PLAXIS, including the initial phase
+PHASE_NAMES = [
+    "Initial phase",
+    "First embankment construction",
+    "First consolidation",
+    "Second embankment construction",
+    "End of consolidation",
+]
+# Keys of the calculation phases in the staging tab, in the order in which they are calculated
+PHASE_KEYS = ["first_construction", "first_consolidation", "second_construction", "end_of_consolidation"]
+# Staging of the phases for embankments that were saved before the staging was configurable. The consolidation phases
+# use the minimum excess pore pressure as exit condition, which is not the same as in tutorial 08!
+DEFAULT_STAGING = {
+    "first_construction": {"time_interval": 2.0},
+    "first_consolidation": {"loading_type": "Minimum excess pore pressure", "time_interval": 30.0},
+    "second_construction": {"time_interval": 1.0},
+    "end_of_consolidation": {"loading_type": "Minimum excess pore pressure", "time_interval": 30.0},
+}
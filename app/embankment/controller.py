@@ -15,26 +15,58 @@ SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-import json
-from copy import deepcopy
-from io import BytesIO
-from pathlib import Path
-
-import plotly.graph_objects as go
 from munch import Munch
-from munch import unmunchify
-from viktor import File
+from viktor import UserError
 from viktor.core import ViktorController
-from viktor.external.generic import GenericAnalysis
+from viktor.result import DownloadResult
+from viktor.views import DataGroup
+from viktor.views import DataItem
+from viktor.views import DataStatus
 from viktor.views import GeometryResult
 from viktor.views import GeometryView
-from viktor.views import PlotlyResult
-from viktor.views import PlotlyView
+from viktor.views import PlotlyAndDataResult
+from viktor.views import PlotlyAndDataView
 
+from app.embankment.analysis import get_result
+from app.embankment.analysis import get_stored_result
+from app.embankment.analysis import get_worker_input
+from app.embankment.analysis import prepare_job
+from app.embankment.constants import MAX_PLOT_POINTS
+from app.embankment.constants import PHASE_NAMES
 from app.embankment.parametrization import EmbankmentParametrization
+from app.embankment.plotting import get_output_csv
+from app.embankment.plotting import get_p_excess_figure
+from app.embankment.plotting import get_surrogate_figure
+from app.embankment.surrogate import TIME_GRID
+from app.embankment.surrogate import SurrogateModel
+from app.embankment.surrogate import get_dataset
+from app.embankment.surrogate import get_surrogate_features
 from app.embankment.visualisation import get_embankment_geometry_group
 
 
+def _get_metrics_data_group(metrics: dict) -> DataGroup:
+    """Show the consolidation metrics of the calculation phases"""
+    phase_items = []
+    for phase_metrics in metrics["phases"]:
+        if phase_metrics["phase"] == 0:  # No excess pore pressures in the initial phase
+            continue
+        phase_items.append(
+            DataItem(
+                PHASE_NAMES[phase_metrics["phase"]],
+                None,
+                subgroup=DataGroup(
+                    DataItem("Peak P_excess", phase_metrics["peak_p_excess"], suffix="kN / m^2", number_of_decimals=2),
+                    DataItem(
+                        "Residual P_excess", phase_metrics["residual_p_excess"], suffix="kN / m^2", number_of_decimals=2
+                    ),
+                    DataItem("t50", phase_metrics["t50"], suffix="days", number_of_decimals=2),
+                    DataItem("t90", phase_metrics["t90"], suffix="days", number_of_decimals=2),
+                ),
+            )
+        )
+    return DataGroup(*phase_items)
+
+
 class EmbankmentController(ViktorController):
     """
     Controller to show embankment designs
@@ -49,35 +81,41 @@ class EmbankmentController(ViktorController):
         geometry_group = get_embankment_geometry_group(params)
         return GeometryResult(geometry_group)
 
-    @PlotlyView("PLAXIS analysis", duration_guess=300)
-    def run_plaxis(self, params, **kwargs) -> PlotlyResult:
+    @PlotlyAndDataView("PLAXIS analysis", duration_guess=300)
+    def run_plaxis(self, params, entity_id: int, **kwargs) -> PlotlyAndDataResult:
         """Evaluate the PLAXIS embankment model and visualise the result"""
-        params_ = deepcopy(params)
-        params_materials_list = [params_.geometry_tab.embankment.material.last_saved_params]
-        # Preprocess params: replace all material IDs with the name of the material
-        params_.geometry_tab.embankment.material = {
-            "name": params_.geometry_tab.embankment.material.last_saved_params.general.MaterialName
-        }
-        for layer in params_.geometry_tab.soil.layers:
-            params_materials_list.append(unmunchify(layer.material.last_saved_params))
-            layer.material = {"name": layer.material.last_saved_params.general.MaterialName}
-        # Make the files that should be sent to the worker
-        json_input = json.dumps(unmunchify(params_))
-        json_materials = json.dumps(params_materials_list)
-        plaxis_script_path = Path(__file__).parents[1] / "lib" / "plaxis.py"
-        plaxis_script_bytes = File.from_path(plaxis_script_path).getvalue_binary()
-        files = [
-            ("input.json", BytesIO(json_input.encode())),
-            ("materials.json", BytesIO(json_materials.encode())),
-            ("plaxis.py", BytesIO(plaxis_script_bytes)),
-        ]
-        # Run the worker
-        generic_analysis = GenericAnalysis(files=files, output_filenames=["output.json"], executable_key="plaxis")
-        generic_analysis.execute(timeout=600)
-        output_file = generic_analysis.get_output_file("output.json")
-        # Load the output from the worker
-        output = json.load(output_file)
+        # Only runs the worker if this design has not been analysed before
+        output = get_result(params, entity_id=entity_id)
         # Visualise the output
-        fig = go.Figure(data=go.Scatter(x=output["time"], y=output["p_excess"]))
-        fig.update_layout(xaxis_title="Time [days]", yaxis_title="P_Excess [kN / m^2]")
-        return PlotlyResult(fig.to_json())
+        # Embankments saved before the number of plot points was configurable use the default
+        max_points = (params.get("results_tab") or {}).get("max_plot_points") or MAX_PLOT_POINTS
+        fig = get_p_excess_figure({"P_excess": output}, max_points=max_points)
+        return PlotlyAndDataResult(fig.to_json(), _get_metrics_data_group(output["metrics"]))
+
+    @PlotlyAndDataView("Surrogate prediction", duration_guess=2)
+    def predict_p_excess(self, params: Munch, **kwargs: dict) -> PlotlyAndDataResult:
+        """Predict the PLAXIS result with a surrogate model that is trained on the earlier analyses in this workspace"""
+        json_input, json_materials = get_worker_input(params)
+        records = get_dataset()
+        prediction = SurrogateModel(records).predict(get_surrogate_features(json_input, json_materials))
+        if prediction.in_envelope:
+            status, message = DataStatus.SUCCESS, "Within the training envelope"
+        elif prediction.outside_features:
+            status = DataStatus.WARNING
+            message = f"Outside the training envelope ({', '.join(prediction.outside_features)}): run PLAXIS"
+        else:
+            status, message = DataStatus.WARNING, "Far from the trained designs: run PLAXIS"
+        data = DataGroup(
+            DataItem("Training analyses", len(records)),
+            DataItem("Reliability", message, status=status),
+        )
+        fig = get_surrogate_figure(TIME_GRID, prediction.p_excess, prediction.std)
+        return PlotlyAndDataResult(fig.to_json(), data)
+
+    def download_plaxis_output(self, params: Munch, entity_id: int, **kwargs: dict) -> DownloadResult:
+        """Download the full resolution PLAXIS result as CSV. Only stored results are downloaded, a download does not
+        start an analysis"""
+        output = get_stored_result(prepare_job(params, entity_id=entity_id))
+        if output is None:
+            raise UserError("This design has not been analysed yet, open the 'PLAXIS analysis' view first")
+        return DownloadResult(get_output_csv(output), file_name="plaxis_output.csv")
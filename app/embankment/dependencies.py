@@ -0,0 +1,95 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import hashlib
+import json
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+from munch import Munch
+from munch import unmunchify
+from viktor import File
+from viktor.core import Storage
+
+DEPENDENCIES_STORAGE_KEY = "material_dependencies"
+# Tab of the material parametrization with the actions on the dependent analyses, which is not a material property
+MATERIAL_ANALYSES_TAB = "analyses"
+
+
+def get_material_properties(material_params: Munch) -> dict:
+    """Parameters of a material that are sent to the worker"""
+    material_properties = unmunchify(material_params)
+    material_properties.pop(MATERIAL_ANALYSES_TAB, None)
+    return material_properties
+
+
+def get_material_hash(material_params: Munch) -> str:
+    """Hash of the saved revision of a material, used to recognise analyses that used an older revision"""
+    return hashlib.sha256(json.dumps(get_material_properties(material_params), sort_keys=True).encode()).hexdigest()
+
+
+def get_material_hashes(params: Munch) -> Dict[int, str]:
+    """Hashes of the materials that an embankment uses, keyed by material entity id"""
+    materials = [params.geometry_tab.embankment.material] + [
+        layer.material for layer in params.geometry_tab.soil.layers
+    ]
+    return {material.id: get_material_hash(material.last_saved_params) for material in materials}
+
+
+def get_dependency_index() -> Dict[str, Dict[str, str]]:
+    """Return the index of the analyses that depend on each material, as the material hash used per embankment id,
+    keyed by material id"""
+    try:
+        return json.loads(Storage().get(DEPENDENCIES_STORAGE_KEY, scope="workspace").getvalue())
+    except FileNotFoundError:
+        return {}
+
+
+def set_dependency_index(index: Dict[str, Dict[str, str]]) -> None:
+    """Store the dependency index, without the materials that no analysis depends on"""
+    index = {material_id: dependents for material_id, dependents in index.items() if dependents}
+    Storage().set(DEPENDENCIES_STORAGE_KEY, data=File.from_data(json.dumps(index)), scope="workspace")
+
+
+def add_dependencies(analyses: List[Tuple[int, Dict[int, str]]]) -> None:
+    """Record the materials that the stored analyses of embankments used, replacing their earlier records
+
+    :param analyses: embankment id and the material hashes of its analysis
+    """
+    index = get_dependency_index()
+    for embankment_id, material_hashes in analyses:
+        for dependents in index.values():
+            dependents.pop(str(embankment_id), None)
+        for material_id, material_hash in material_hashes.items():
+            index.setdefault(str(material_id), {})[str(embankment_id)] = material_hash
+    set_dependency_index(index)
+
+
+def get_dependents(material_id: int, material_hash: str) -> Dict[int, bool]:
+    """Embankments of which the stored analysis used a material, and whether it used an older revision of it"""
+    dependents = get_dependency_index().get(str(material_id), {})
+    return {int(embankment_id): used_hash != material_hash for embankment_id, used_hash in dependents.items()}
+
+
+def remove_dependents(embankment_ids: List[int]) -> None:
+    """Remove the records of embankments of which the stored analysis has been invalidated"""
+    index = get_dependency_index()
+    for embankment_id in embankment_ids:
+        for dependents in index.values():
+            dependents.pop(str(embankment_id), None)
+    set_dependency_index(index)
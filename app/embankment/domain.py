@@ -0,0 +1,84 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from typing import List
+
+import numpy as np
+from munch import Munch
+
+MIN_SOIL_WIDTH = 30.0
+MAX_SOIL_WIDTH = 120.0
+WIDTH_STEP = 0.5
+# The soil width has to be at least this factor times the total embankment width, see _check_params
+MIN_FOOTPRINT_FACTOR = 1.5
+
+
+def get_strip_load_stress(x: np.ndarray, z: np.ndarray, half_width: float) -> np.ndarray:
+    """Vertical stress increment below a uniform strip load of unit magnitude on an elastic half-space
+
+    :param x: horizontal distance from the centre of the strip
+    :param z: depth below the surface (positive)
+    :param half_width: half the width of the strip
+    """
+    theta_1 = np.arctan2(x + half_width, z)
+    theta_2 = np.arctan2(x - half_width, z)
+    return (theta_1 - theta_2 + np.sin(theta_1 - theta_2) * np.cos(theta_1 + theta_2)) / np.pi
+
+
+def get_minimum_soil_width(geometry: Munch, tolerance: float) -> float:
+    """Smallest soil width for which the boundary does not affect the result at the curve point.
+
+    The embankment is represented by a strip load with the same total load, i.e. with the width of the embankment at
+    half its height. The width is the smallest width for which the vertical stress increment at the lateral boundary is
+    below the tolerance times the increment at the curve point (on the axis, at the bottom of the first layer), at any
+    depth of the layer stack. The width is at least 1.5 times the total embankment width, which also covers the drains.
+
+    :param geometry: geometry tab of the embankment params
+    :param tolerance: allowed ratio of the stress increment at the boundary and at the curve point
+    """
+    half_width = geometry.embankment.width / 2.0 + geometry.embankment.slope_width / 2.0
+    thicknesses = [layer.thickness for layer in geometry.soil.layers]
+    reference_stress = get_strip_load_stress(np.array(0.0), np.array(thicknesses[0]), half_width)
+    depths = np.linspace(0.1, sum(thicknesses), 50)
+    footprint = geometry.embankment.width + 2.0 * geometry.embankment.slope_width
+    min_width = max(MIN_SOIL_WIDTH, np.ceil(MIN_FOOTPRINT_FACTOR * footprint / WIDTH_STEP) * WIDTH_STEP)
+    widths = np.arange(min_width, MAX_SOIL_WIDTH + WIDTH_STEP, WIDTH_STEP)
+    boundary_stress = get_strip_load_stress(widths[:, np.newaxis], depths[np.newaxis, :], half_width).max(axis=1)
+    sufficient = boundary_stress <= tolerance * reference_stress
+    if not sufficient.any():
+        return MAX_SOIL_WIDTH
+    return float(widths[np.argmax(sufficient)])
+
+
+def get_soil_width(geometry: Munch) -> float:
+    """Soil width of the model, which is either set by the user or determined automatically"""
+    if geometry.soil.get("auto_width"):
+        return get_minimum_soil_width(geometry, geometry.soil.boundary_tolerance / 100.0)
+    return float(geometry.soil.width)
+
+
+def get_drain_errors(geometry: Munch) -> List[str]:
+    """Messages for the drain settings with which the worker cannot create the drains"""
+    drain = geometry.drain
+    if not drain.selector:
+        return []
+    errors = []
+    if not drain.spacing or drain.spacing <= 0:
+        errors.append("The drain spacing should be larger than 0")
+    if not drain.depth or not 1 <= drain.depth <= len(geometry.soil.layers):
+        errors.append(f"The drains should end in one of the {len(geometry.soil.layers)} soil layers")
+    return errors
@@ -0,0 +1,109 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import numpy as np
+
+# Version of the metrics, such that stored metrics are derived again when the way they are derived changes
+METRICS_VERSION = 2
+
+
+def get_phase_steps(in_phase: np.ndarray) -> np.ndarray:
+    """Steps of a phase, including the last step of the previous phase, which is the start of the phase"""
+    if in_phase[0] > 0:
+        return np.concatenate(([in_phase[0] - 1], in_phase))
+    return in_phase
+
+
+def get_degree_of_consolidation(p_excess: np.ndarray, phase: np.ndarray) -> np.ndarray:
+    """Degree of consolidation U(t) = 1 - |p(t)| / |p_peak| of each step, with p_peak the peak excess pore pressure of
+    the phase of the step, including the excess pore pressure at the start of the phase. Steps before the peak is
+    reached have U = 0.
+
+    :param p_excess: excess pore pressures of shape (curve points, steps)
+    :param phase: phase index of each step
+    :return: degree of consolidation of shape (curve points, steps)
+    """
+    magnitude = np.abs(p_excess)
+    degree = np.zeros_like(magnitude)
+    for phase_number in np.unique(phase):
+        in_phase = np.flatnonzero(phase == phase_number)
+        steps = get_phase_steps(in_phase)
+        phase_magnitude = magnitude[:, steps]
+        peak_step = np.argmax(phase_magnitude, axis=1)
+        peak = phase_magnitude[np.arange(len(peak_step)), peak_step]
+        phase_degree = 1.0 - phase_magnitude / np.where(peak > 0, peak, 1.0)[:, np.newaxis]
+        after_peak = (np.arange(len(steps)) >= peak_step[:, np.newaxis]) & (peak > 0)[:, np.newaxis]
+        degree[:, in_phase] = np.where(after_peak, phase_degree, 0.0)[:, len(steps) - len(in_phase) :]
+    return degree
+
+
+def get_time_to_degree(time: np.ndarray, degree: np.ndarray, target: float) -> np.ndarray:
+    """Time at which the degree of consolidation first reaches the target, interpolated linearly between the steps.
+
+    :param time: time of each step of a phase, relative to the start of the phase
+    :param degree: degree of consolidation of shape (curve points, steps)
+    :return: time for each curve point, NaN if the target is not reached
+    """
+    reached = degree >= target
+    first = np.argmax(reached, axis=1)
+    previous = np.maximum(first - 1, 0)
+    rows = np.arange(degree.shape[0])
+    degree_1, degree_2 = degree[rows, previous], degree[rows, first]
+    fraction = np.divide(target - degree_1, degree_2 - degree_1, out=np.zeros_like(degree_1), where=degree_2 > degree_1)
+    interpolated = time[previous] + fraction * (time[first] - time[previous])
+    return np.where(reached.any(axis=1), interpolated, np.nan)
+
+
+def _to_optional_float(value: float) -> Optional[float]:
+    """Convert NaN to None, such that the metrics can be stored as valid JSON"""
+    return None if np.isnan(value) else float(value)
+
+
+def get_consolidation_metrics(output: dict) -> Dict[str, List]:
+    """Derive the consolidation metrics from the output of the worker.
+
+    For each phase, the peak (including the start of the phase) and residual (end of phase) excess pore pressure are
+    determined, as well as the time after the start of the phase at which 50% and 90% consolidation is reached (t50
+    and t90). The degree of consolidation of
+    each step is included as well. Outputs without phase information are treated as a single phase.
+    """
+    time = np.asarray(output["time"], dtype=float)
+    p_excess = np.atleast_2d(np.asarray(output["p_excess"], dtype=float))
+    phase = np.asarray(output.get("phase", np.zeros(len(time), dtype=int)))
+    degree = get_degree_of_consolidation(p_excess, phase)
+    phases = []
+    for phase_number in np.unique(phase):
+        in_phase = np.flatnonzero(phase == phase_number)
+        start_time = time[max(in_phase[0] - 1, 0)]  # A phase starts at the last step of the previous phase
+        phase_time = time[in_phase] - start_time
+        magnitude = np.abs(p_excess[:, get_phase_steps(in_phase)])
+        phases.append(
+            {
+                "phase": int(phase_number),
+                "start_time": float(start_time),
+                "end_time": float(time[in_phase[-1]]),
+                "peak_p_excess": float(magnitude.max(axis=1)[0]),
+                "residual_p_excess": float(magnitude[:, -1][0]),
+                "t50": _to_optional_float(get_time_to_degree(phase_time, degree[:, in_phase], 0.5)[0]),
+                "t90": _to_optional_float(get_time_to_degree(phase_time, degree[:, in_phase], 0.9)[0]),
+            }
+        )
+    return {"version": METRICS_VERSION, "phases": phases, "degree_of_consolidation": degree[0].tolist()}
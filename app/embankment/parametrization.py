@@ -17,11 +17,15 @@ SOFTWARE.
 """
 from munch import Munch
 from viktor.parametrization import BooleanField
+from viktor.parametrization import DownloadButton
 from viktor.parametrization import DynamicArray
 from viktor.parametrization import EntityOptionField
 from viktor.parametrization import IntegerField
+from viktor.parametrization import IsEqual
+from viktor.parametrization import IsFalse
 from viktor.parametrization import Lookup
 from viktor.parametrization import NumberField
+from viktor.parametrization import OptionField
 from viktor.parametrization import Parametrization
 from viktor.parametrization import Section
 from viktor.parametrization import Tab
@@ -72,6 +76,10 @@ class EmbankmentParametrization(Parametrization):
         suffix="m")
     geometry_tab.embankment.material = EntityOptionField(ui_name="Material", entity_type_names=["Material"])
     geometry_tab.soil = Section("Soil")
+    geometry_tab.soil.auto_width = BooleanField(
+        "Automatic soil semi-width",
+        default=False,
+        description="Use the smallest soil width for which the boundary does not affect the result")
     geometry_tab.soil.width = NumberField(
         "Soil semi-width",
         default=60.0,
@@ -80,7 +88,19 @@ class EmbankmentParametrization(Parametrization):
         max=120.0,
         num_decimals=2,
         variant="standard",
-        suffix="m")
+        suffix="m",
+        visible=IsFalse(Lookup("geometry_tab.soil.auto_width")))
+    geometry_tab.soil.boundary_tolerance = NumberField(
+        "Boundary tolerance",
+        default=5.0,
+        step=0.5,
+        min=0.5,
+        max=20.0,
+        num_decimals=1,
+        variant="standard",
+        suffix="%",
+        description="Allowed vertical stress increase at the boundary, relative to the increase at the curve point",
+        visible=Lookup("geometry_tab.soil.auto_width"))
     geometry_tab.soil.layers = DynamicArray("Layers")
     geometry_tab.soil.layers.thickness = NumberField(
         "Thickness",
@@ -115,3 +135,99 @@ class EmbankmentParametrization(Parametrization):
         max=_max_drain_depth,
         suffix="layers deep",
         visible=Lookup("geometry_tab.drain.selector"))
+
+    staging_tab = Tab("Staging")
+    staging_tab.first_construction = Section("First embankment construction")
+    staging_tab.first_construction.time_interval = NumberField(
+        "Time interval",
+        default=2.0,
+        step=0.5,
+        min=0.1,
+        num_decimals=1,
+        variant="standard",
+        suffix="days")
+    staging_tab.first_consolidation = Section("First consolidation")
+    staging_tab.first_consolidation.loading_type = OptionField(
+        "Loading type",
+        options=["Minimum excess pore pressure", "Staged construction"],
+        default="Minimum excess pore pressure",
+        description="With a minimum excess pore pressure, the phase ends when the excess pore pressures have "
+                    "dissipated")
+    staging_tab.first_consolidation.time_interval = NumberField(
+        "Time interval",
+        default=30.0,
+        step=1.0,
+        min=0.1,
+        num_decimals=1,
+        variant="standard",
+        suffix="days",
+        visible=IsEqual(Lookup("staging_tab.first_consolidation.loading_type"), "Staged construction"))
+    staging_tab.second_construction = Section("Second embankment construction")
+    staging_tab.second_construction.time_interval = NumberField(
+        "Time interval",
+        default=1.0,
+        step=0.5,
+        min=0.1,
+        num_decimals=1,
+        variant="standard",
+        suffix="days")
+    staging_tab.end_of_consolidation = Section("End of consolidation")
+    staging_tab.end_of_consolidation.loading_type = OptionField(
+        "Loading type",
+        options=["Minimum excess pore pressure", "Staged construction"],
+        default="Minimum excess pore pressure",
+        description="With a minimum excess pore pressure, the phase ends when the excess pore pressures have "
+                    "dissipated")
+    staging_tab.end_of_consolidation.time_interval = NumberField(
+        "Time interval",
+        default=30.0,
+        step=1.0,
+        min=0.1,
+        num_decimals=1,
+        variant="standard",
+        suffix="days",
+        visible=IsEqual(Lookup("staging_tab.end_of_consolidation.loading_type"), "Staged construction"))
+
+    calculation_tab = Tab("Calculation")
+    calculation_tab.solver = Section("Solver")
+    calculation_tab.solver.solver = OptionField(
+        "Solver type",
+        options=["Picos (multicore iterative)", "Pardiso (multicore direct)", "Classic (single core iterative)"],
+        description="Leave empty to use the default solver of PLAXIS")
+    calculation_tab.solver.max_cores = IntegerField(
+        "Cores per calculation",
+        min=1,
+        max=64,
+        description="Leave empty to divide the cores of the worker between the analyses that run at the same time")
+    calculation_tab.first_consolidation = Section("First consolidation")
+    calculation_tab.first_consolidation.max_steps = IntegerField(
+        "Maximum steps",
+        min=1,
+        max=100000,
+        description="Leave empty to use the default of PLAXIS")
+    calculation_tab.first_consolidation.max_iterations = IntegerField(
+        "Maximum iterations",
+        min=1,
+        max=1000,
+        description="Maximum number of iterations per step. Leave empty to use the default of PLAXIS")
+    calculation_tab.end_of_consolidation = Section("End of consolidation")
+    calculation_tab.end_of_consolidation.max_steps = IntegerField(
+        "Maximum steps",
+        min=1,
+        max=100000,
+        description="Leave empty to use the default of PLAXIS")
+    calculation_tab.end_of_consolidation.max_iterations = IntegerField(
+        "Maximum iterations",
+        min=1,
+        max=1000,
+        description="Maximum number of iterations per step. Leave empty to use the default of PLAXIS")
+
+    results_tab = Tab("Results")
+    results_tab.max_plot_points = IntegerField(
+        "Plot points",
+        default=2000,
+        min=100,
+        max=20000,
+        description="Maximum number of points that is plotted. The curve is decimated while preserving its shape",
+    )
+    results_tab.download_output = DownloadButton("Download full result", method="download_plaxis_output")
@@ -0,0 +1,105 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import numpy as np
+import plotly.graph_objects as go
+
+from app.embankment.constants import MAX_PLOT_POINTS
+from app.embankment.constants import WEBGL_THRESHOLD
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Return the indices of the points that are kept when decimating a curve to n_out points using the
+    Largest-Triangle-Three-Buckets algorithm.
+
+    The first and last point are always kept. The points in between are divided in buckets, of which the point that
+    spans the largest triangle with the previously selected point and the average of the next bucket is kept. This
+    preserves peaks and the overall shape of the curve.
+    """
+    if n_out >= len(x) or n_out < 3:
+        return np.arange(len(x))
+    bucket_edges = np.linspace(1, len(x) - 1, n_out - 1).astype(int)
+    selected = np.zeros(n_out, dtype=int)
+    selected[-1] = len(x) - 1
+    for i in range(n_out - 2):
+        start, end = bucket_edges[i], bucket_edges[i + 1]
+        next_end = bucket_edges[i + 2] if i + 2 < len(bucket_edges) else len(x)
+        x_next, y_next = x[end:next_end].mean(), y[end:next_end].mean()
+        x_prev, y_prev = x[selected[i]], y[selected[i]]
+        areas = np.abs((x_prev - x_next) * (y[start:end] - y_prev) - (x_prev - x[start:end]) * (y_next - y_prev))
+        selected[i + 1] = start + np.argmax(areas)
+    return selected
+
+
+def decimate_curve(time: List[float], p_excess: List[float], n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Decimate a P_excess-vs-time curve to n_out points.
+
+    The selection is done on a logarithmic time axis, as the pore pressures change quickly at the start of each phase
+    and slowly during the long consolidation phases. The time of the initial phase (t = 0) is clipped to the first
+    positive time to be able to take the logarithm.
+    """
+    time = np.asarray(time, dtype=float)
+    p_excess = np.asarray(p_excess, dtype=float)
+    positive_time = time[time > 0]
+    if positive_time.size == 0:
+        return time, p_excess
+    log_time = np.log10(np.clip(time, positive_time.min(), None))
+    selected = lttb(log_time, p_excess, n_out)
+    return time[selected], p_excess[selected]
+
+
+def get_p_excess_figure(outputs: Dict[str, dict], max_points: int = MAX_PLOT_POINTS) -> go.Figure:
+    """Plot the P_excess-vs-time curves of one or multiple PLAXIS outputs, keyed by their legend name.
+
+    The curves share a budget of max_points, so the size of the figure does not depend on the number of steps. Large
+    figures are drawn with WebGL traces.
+    """
+    fig = go.Figure()
+    points_per_curve = max(max_points // max(len(outputs), 1), 3)
+    curves = {
+        name: decimate_curve(output["time"], output["p_excess"], points_per_curve) for name, output in outputs.items()
+    }
+    scatter = go.Scattergl if sum(len(time) for time, _ in curves.values()) > WEBGL_THRESHOLD else go.Scatter
+    for name, (time, p_excess) in curves.items():
+        fig.add_trace(scatter(x=time, y=p_excess, mode="lines", name=name))
+    fig.update_layout(xaxis_title="Time [days]", yaxis_title="P_Excess [kN / m^2]", showlegend=len(outputs) > 1)
+    return fig
+
+
+def get_surrogate_figure(time: np.ndarray, p_excess: np.ndarray, std: np.ndarray) -> go.Figure:
+    """Plot a predicted P_excess-vs-time curve with its 95% confidence band"""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=time, y=p_excess + 2 * std, mode="lines", line_width=0, showlegend=False))
+    fig.add_trace(
+        go.Scatter(
+            x=time, y=p_excess - 2 * std, mode="lines", line_width=0, fill="tonexty", name="95% confidence interval"
+        )
+    )
+    fig.add_trace(go.Scatter(x=time, y=p_excess, mode="lines", name="Prediction"))
+    fig.update_layout(xaxis_title="Time [days]", yaxis_title="P_Excess [kN / m^2]", xaxis_type="log")
+    return fig
+
+
+def get_output_csv(output: dict) -> str:
+    """Full resolution P_excess-vs-time curve as CSV"""
+    lines = ["time [days],p_excess [kN / m^2]"]
+    lines.extend(f"{time!r},{p_excess!r}" for time, p_excess in zip(output["time"], output["p_excess"]))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,115 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+from typing import List
+from typing import Tuple
+
+import numpy as np
+from munch import Munch
+from viktor import File
+from viktor.core import Storage
+
+RUNTIME_STORAGE_KEY = "plaxis_runtimes"
+MAX_RUNTIME_RECORDS = 500  # Only the most recent runs are used, such that the model follows changes of the worker
+DEFAULT_RUNTIME = 300  # Expected run time [s] as long as too few runs have been recorded
+MIN_TIMEOUT = 120
+MAX_TIMEOUT = 3600
+TIMEOUT_SAFETY_FACTOR = 1.5
+TIMED_OUT_FACTOR = 2.0  # An analysis that was killed at its timeout gets at least this times that timeout next time
+CENSORING_ITERATIONS = 5
+
+
+def get_runtime_features(geometry: Munch, n_phases: int) -> List[float]:
+    """Features of an embankment geometry that determine the run time of the analysis.
+
+    The mesh coarseness is the same for every analysis, so it is covered by the constant. The number of phases is the
+    number of phases that is calculated, which is lower if a saved project is reused.
+    """
+    n_drains = 0
+    if geometry.drain.selector:
+        n_drains = len(
+            np.arange(
+                geometry.drain.spacing / 2.0,
+                geometry.embankment.width / 2.0 + geometry.embankment.slope_width,
+                geometry.drain.spacing,
+            )
+        )
+    return [
+        1.0,
+        len(geometry.soil.layers),
+        n_drains,
+        geometry.soil.width,
+        sum(layer.thickness for layer in geometry.soil.layers),
+        n_phases,
+    ]
+
+
+def get_runtime_records() -> List[dict]:
+    """Return the recorded run times of previous analyses in this workspace"""
+    try:
+        return json.loads(Storage().get(RUNTIME_STORAGE_KEY, scope="workspace").getvalue())
+    except FileNotFoundError:
+        return []
+
+
+def add_runtime_records(new_records: List[dict]) -> None:
+    """Record the features and run times of analyses, such that the next prediction takes them into account"""
+    records = get_runtime_records() + new_records
+    records = records[-MAX_RUNTIME_RECORDS:]
+    Storage().set(RUNTIME_STORAGE_KEY, data=File.from_data(json.dumps(records)), scope="workspace")
+
+
+def predict_runtime(features: List[float], records: List[dict]) -> Tuple[float, float]:
+    """Predict the run time [s] of an analysis and the standard deviation of the prediction.
+
+    A linear model is fitted on the recorded runs using ridge regression. As long as fewer runs are recorded than there
+    are features, the default run time is returned. Runs that were killed at their timeout are censored: their run time
+    is only known to be longer than the timeout. Their run time is estimated iteratively as the larger of the timeout
+    and the fitted run time.
+    """
+    records = [record for record in records if len(record["features"]) == len(features)]
+    if len(records) <= len(features):
+        return DEFAULT_RUNTIME, DEFAULT_RUNTIME
+    x = np.array([record["features"] for record in records], dtype=float)
+    y = np.array([record["duration"] for record in records], dtype=float)
+    censored = np.array([record.get("censored", False) for record in records])
+    regularization = 1e-3 * np.eye(x.shape[1])
+    y_estimated = y
+    for _ in range(CENSORING_ITERATIONS if censored.any() else 1):
+        coefficients = np.linalg.solve(x.T @ x + regularization, x.T @ y_estimated)
+        y_estimated = np.where(censored, np.maximum(y, x @ coefficients), y)
+    prediction = max(float(np.asarray(features, dtype=float) @ coefficients), float(y_estimated.min()))
+    if censored.all():
+        return prediction, DEFAULT_RUNTIME
+    residuals = (y_estimated - x @ coefficients)[~censored]
+    return prediction, float(np.sqrt(np.mean(residuals**2)))
+
+
+def get_timed_out_duration(features: List[float], records: List[dict]) -> float:
+    """Longest timeout [s] at which an analysis with the same features was killed, or 0 if none was killed"""
+    return max(
+        (record["duration"] for record in records if record.get("censored") and record["features"] == features),
+        default=0.0,
+    )
+
+
+def get_timeout(prediction: float, std: float, timed_out_duration: float = 0.0) -> int:
+    """Timeout [s] for an analysis, with a safety margin on the predicted run time. If an analysis with the same
+    features was killed before, the timeout is raised, such that it is not killed at the same timeout again"""
+    timeout = max((prediction + 3 * std) * TIMEOUT_SAFETY_FACTOR, TIMED_OUT_FACTOR * timed_out_duration)
+    return int(np.clip(timeout, MIN_TIMEOUT, MAX_TIMEOUT))
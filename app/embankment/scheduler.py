@@ -0,0 +1,332 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from enum import IntEnum
+from functools import partial
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+import numpy as np
+from viktor import File
+from viktor import progress_message
+from viktor.api_v1 import API
+from viktor.core import Storage
+
+from app.embankment.constants import WORKER_CAPACITY
+
+QUEUE_STORAGE_KEY = "plaxis_queue"
+QUEUE_RECORDS_STORAGE_KEY = "plaxis_queue_records"
+MAX_QUEUE_RECORDS = 500
+POLL_INTERVAL = 5  # [s]
+STALE_TICKET_AGE = 120  # [s] Tickets of which the owner stopped polling, e.g. because its process ended, are removed
+AGING_INTERVAL = 600  # [s] Waiting tickets move up one priority class per interval, such that batches are not starved
+QUICK_RUNTIME = 120  # [s] Analyses that are expected to finish within this time are run as interactive analyses
+
+
+class Priority(IntEnum):
+    """Priority classes of the analyses. Lower values are admitted to the worker first"""
+
+    INTERACTIVE = 0  # Quick analysis that a user is waiting for in a view
+    ANALYSIS = 1  # Full analysis that a user is waiting for in a view
+    BATCH = 2  # Analyses of multiple embankments, e.g. for the comparison view
+
+
+class ScheduledJob(NamedTuple):
+    """Analysis to be admitted to the worker by the scheduler"""
+
+    entity_id: Optional[int]
+    input_hash: str
+    priority: Priority
+
+
+def get_job_priority(priority: Priority, runtime: float) -> Priority:
+    """Run analyses that are expected to be quick as interactive analyses, such that quick checks are not delayed by
+    long analyses"""
+    if priority == Priority.ANALYSIS and runtime <= QUICK_RUNTIME:
+        return Priority.INTERACTIVE
+    return priority
+
+
+def get_current_user() -> str:
+    """Email address of the current user, used to share the worker fairly between the users"""
+    return API().get_current_user().email or "unknown"
+
+
+def get_queue(now: float = None) -> List[dict]:
+    """Return the tickets in the worker queue of the workspace, without the tickets that are no longer polled"""
+    now = now or time.time()
+    try:
+        tickets = json.loads(Storage().get(QUEUE_STORAGE_KEY, scope="workspace").getvalue())
+    except FileNotFoundError:
+        return []
+    return [ticket for ticket in tickets if now - ticket["heartbeat"] <= STALE_TICKET_AGE]
+
+
+def set_queue(tickets: List[dict]) -> None:
+    """Store the tickets in the worker queue. The queue is read and written by all running views without locking, so
+    the scheduling is best-effort: a slot can occasionally be taken by two analyses at the same time"""
+    Storage().set(QUEUE_STORAGE_KEY, data=File.from_data(json.dumps(tickets)), scope="workspace")
+
+
+def get_queue_records() -> List[dict]:
+    """Return the recorded queue depths and waiting times of previous analyses in this workspace"""
+    try:
+        return json.loads(Storage().get(QUEUE_RECORDS_STORAGE_KEY, scope="workspace").getvalue())
+    except FileNotFoundError:
+        return []
+
+
+def add_queue_records(new_records: List[dict]) -> None:
+    """Record the queue depth and waiting time of admitted analyses"""
+    records = get_queue_records() + new_records
+    records = records[-MAX_QUEUE_RECORDS:]
+    Storage().set(QUEUE_RECORDS_STORAGE_KEY, data=File.from_data(json.dumps(records)), scope="workspace")
+
+
+def supersede_tickets(tickets: List[dict], entity_id: Optional[int], input_hash: str) -> bool:
+    """Cancel the waiting tickets of an entity that have a different input, in any priority class. The owners of these
+    tickets stop waiting for them. Return whether any ticket was cancelled"""
+    cancelled = False
+    for ticket in tickets:
+        if (
+            entity_id is not None
+            and ticket["state"] == "queued"
+            and ticket["entity_id"] == entity_id
+            and ticket["input_hash"] != input_hash
+        ):
+            ticket["state"] = "cancelled"
+            cancelled = True
+    return cancelled
+
+
+def take_over_tickets(tickets: List[dict], entity_id: int, input_hash: str, priority: Priority) -> bool:
+    """Cancel the waiting tickets of an entity with the same input in a lower priority class than the caller, which
+    runs the analysis at its own priority instead. Return whether any ticket was cancelled"""
+    cancelled = False
+    for ticket in tickets:
+        if (
+            ticket["state"] == "queued"
+            and ticket["entity_id"] == entity_id
+            and ticket["input_hash"] == input_hash
+            and ticket["priority"] > priority
+        ):
+            ticket["state"] = "cancelled"
+            cancelled = True
+    return cancelled
+
+
+def wait_for_analysis(entity_id: int, input_hash: str, priority: Priority) -> None:
+    """Wait until the other analyses of an entity with the same input have finished, such that their stored result can
+    be reused. Waiting analyses of the same input in a lower priority class are cancelled, as the caller would
+    otherwise wait behind the analyses of its class"""
+    tickets = get_queue()
+    if take_over_tickets(tickets, entity_id, input_hash, priority):
+        set_queue(tickets)
+    while any(
+        ticket["entity_id"] == entity_id
+        and ticket["input_hash"] == input_hash
+        and ticket["state"] in ("queued", "running")
+        for ticket in tickets
+    ):
+        progress_message("Waiting for an analysis of the same design that was requested before")
+        time.sleep(POLL_INTERVAL)
+        tickets = get_queue()
+
+
+def get_effective_priority(ticket: dict, now: float) -> int:
+    """Priority of a waiting ticket, which increases with the waiting time"""
+    return max(ticket["priority"] - int((now - ticket["submitted"]) // AGING_INTERVAL), 0)
+
+
+def get_admission_order(tickets: List[dict], now: float) -> List[dict]:
+    """Order in which the waiting tickets are admitted to the worker.
+
+    Tickets are ordered by priority class. Within a class, the ticket of the user with the fewest running and earlier
+    admitted analyses goes first, and otherwise the ticket that was submitted first.
+    """
+    shares = Counter(ticket["user"] for ticket in tickets if ticket["state"] == "running")
+    waiting = [ticket for ticket in tickets if ticket["state"] == "queued"]
+    order = []
+    while waiting:
+        ticket = min(
+            waiting,
+            key=lambda ticket_: (get_effective_priority(ticket_, now), shares[ticket_["user"]], ticket_["submitted"]),
+        )
+        waiting.remove(ticket)
+        order.append(ticket)
+        shares[ticket["user"]] += 1
+    return order
+
+
+def get_queue_summary() -> Dict[str, dict]:
+    """Number of waiting and running analyses per priority class, and the recorded waiting times [s]"""
+    tickets = get_queue()
+    records = get_queue_records()
+    summary = {}
+    for priority in Priority:
+        waiting_times = [record["wait"] for record in records if record["priority"] == priority.name]
+        summary[priority.name] = {
+            "queued": sum(ticket["state"] == "queued" and ticket["priority"] == priority for ticket in tickets),
+            "running": sum(ticket["state"] == "running" and ticket["priority"] == priority for ticket in tickets),
+            "mean_wait": float(np.mean(waiting_times)) if waiting_times else None,
+            "p90_wait": float(np.percentile(waiting_times, 90)) if waiting_times else None,
+        }
+    return summary
+
+
+class _OwnJobs(NamedTuple):
+    """Jobs of one call of run_scheduled, by the state of their tickets"""
+
+    tickets: Dict[str, Tuple[int, dict]]  # Job index and ticket, keyed by ticket id
+    waiting: Set[str]  # Ticket ids of the jobs that have not been admitted yet
+    running: Dict[Future, str]  # Ticket id of the running jobs
+    finished: Dict[int, Future]  # Futures of the finished jobs, keyed by job index
+    records: List[dict]  # Waiting times of the admitted jobs
+    queue_depth: int  # Number of analyses in the queue when the jobs were submitted
+
+
+def _submit_tickets(jobs: List[ScheduledJob]) -> _OwnJobs:
+    """Add a ticket for each job to the worker queue, superseding the waiting tickets of the same entities"""
+    user = get_current_user()
+    now = time.time()
+    tickets = get_queue(now)
+    own_tickets = {}
+    for index, job in enumerate(jobs):
+        supersede_tickets(tickets, job.entity_id, job.input_hash)
+        ticket = {
+            "id": uuid.uuid4().hex,
+            "user": user,
+            "entity_id": job.entity_id,
+            "input_hash": job.input_hash,
+            "priority": int(job.priority),
+            "state": "queued",
+            "submitted": now,
+            "heartbeat": now,
+        }
+        tickets.append(ticket)
+        own_tickets[ticket["id"]] = (index, ticket)
+    queue_depth = sum(ticket["state"] in ("queued", "running") for ticket in tickets) - len(jobs)
+    set_queue(tickets)
+    return _OwnJobs(own_tickets, set(own_tickets), {}, {}, [], queue_depth)
+
+
+def _sync_own_tickets(own: _OwnJobs, now: float) -> List[dict]:
+    """Read the worker queue and merge the own tickets into it: the tickets of finished jobs are removed, tickets that
+    another view cancelled stop waiting, and the other own tickets are kept alive. Return the merged queue"""
+    tickets_by_id = {ticket["id"]: ticket for ticket in get_queue(now)}
+    for future in [future for future in own.running if future.done()]:
+        ticket_id = own.running.pop(future)
+        own.finished[own.tickets[ticket_id][0]] = future
+        tickets_by_id.pop(ticket_id, None)
+    for ticket_id, (_, ticket) in own.tickets.items():
+        if ticket_id in tickets_by_id:
+            ticket.update(tickets_by_id[ticket_id])
+        elif ticket_id in own.waiting or ticket_id in own.running.values():  # Removed by another view as stale
+            tickets_by_id[ticket_id] = ticket
+        if ticket["state"] == "cancelled":
+            own.waiting.discard(ticket_id)
+            tickets_by_id.pop(ticket_id, None)
+        elif ticket_id in tickets_by_id:
+            ticket["heartbeat"] = now
+    return list(tickets_by_id.values())
+
+
+def _admit(
+    tickets: List[dict], own: _OwnJobs, start: Callable[[int], Future], max_parallel: int, now: float
+) -> List[dict]:
+    """Start the own jobs that are first in the queue, as far as the worker has capacity. Tickets of other views are
+    admitted by these views themselves, so their slots are kept free. Return the admission order"""
+    free_slots = WORKER_CAPACITY - sum(ticket["state"] == "running" for ticket in tickets)
+    admission_order = get_admission_order(tickets, now)
+    for ticket in admission_order[: max(free_slots, 0)]:
+        if ticket["id"] in own.waiting and len(own.running) < max_parallel:
+            ticket["state"] = "running"
+            own.waiting.discard(ticket["id"])
+            own.running[start(own.tickets[ticket["id"]][0])] = ticket["id"]
+            own.records.append(
+                {
+                    "priority": Priority(ticket["priority"]).name,
+                    "wait": now - ticket["submitted"],
+                    "depth": own.queue_depth,
+                    "time": now,
+                }
+            )
+    return admission_order
+
+
+def _report(admission_order: List[dict], own: _OwnJobs, message: str) -> None:
+    """Show the position in the queue while jobs are waiting, and otherwise the message"""
+    if own.waiting:
+        ahead = min(position for position, ticket in enumerate(admission_order) if ticket["id"] in own.waiting)
+        progress_message(f"Waiting for the PLAXIS worker, {ahead} analyses are ahead in the queue")
+    else:
+        progress_message(message)
+
+
+def run_scheduled(
+    jobs: List[ScheduledJob], run: Callable[[int], Any], max_parallel: int, message: str
+) -> List[Optional[Any]]:
+    """Run jobs on the worker once the scheduler admits them, and return their results.
+
+    The jobs are added to the worker queue of the workspace, which is polled until all jobs are admitted and finished.
+    At most WORKER_CAPACITY analyses of all users run at the same time. Waiting jobs of the same entity with a
+    different input are superseded by the new jobs, whatever their priority class; the result of a superseded job is
+    None. The result of a failed job is the exception that it raised, such that the results of the other jobs are kept.
+
+    :param jobs: the jobs to schedule
+    :param run: function that runs the job with the given index, which is called in a separate thread
+    :param max_parallel: maximum number of these jobs that run at the same time
+    :param message: progress message that is shown once all jobs are admitted
+    """
+    own = _submit_tickets(jobs)
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_parallel, len(jobs))) as executor:
+            while True:
+                now = time.time()
+                tickets = _sync_own_tickets(own, now)
+                admission_order = _admit(tickets, own, partial(executor.submit, run), max_parallel, now)
+                set_queue(tickets)
+                if not own.waiting and not own.running:
+                    break
+                _report(admission_order, own, message)
+                if own.running:
+                    wait(own.running, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(POLL_INTERVAL)
+    finally:
+        # Remove the tickets of these jobs, also when a job failed
+        set_queue([ticket for ticket in get_queue() if ticket["id"] not in own.tickets])
+        if own.records:
+            add_queue_records(own.records)
+    results: List[Optional[Any]] = [None] * len(jobs)
+    for index, future in own.finished.items():
+        results[index] = future.exception() or future.result()
+    return results
@@ -0,0 +1,251 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+from typing import List
+from typing import NamedTuple
+from typing import Tuple
+
+import numpy as np
+from viktor import File
+from viktor import UserError
+from viktor.core import Storage
+
+DATASET_STORAGE_KEY = "plaxis_surrogate_dataset"
+MAX_DATASET_RECORDS = 500
+MIN_DATASET_RECORDS = 5
+# Curves are compared on a common logarithmic time grid [days]. Beyond the end of an analysis, the last value is held
+TIME_GRID = np.logspace(-2, 4, 64)
+MAX_COMPONENTS = 8
+EXPLAINED_VARIANCE = 0.999
+LENGTH_SCALES = np.array([0.5, 1.0, 2.0, 4.0, 8.0])  # Candidates for the kernel length scale of standardised features
+NOISE = 1e-4  # Relative noise on the component scores, for numerical stability
+ENVELOPE_MARGIN = 0.05  # Relative margin around the range of each training feature
+MAX_RELATIVE_VARIANCE = 0.25  # Posterior variance, relative to the prior, above which a prediction is not trusted
+PLAXIS_DEFAULT_MAX_STEPS = 1000  # Used when the maximum number of steps of a phase is left empty
+FEATURE_NAMES = [
+    "Embankment width",
+    "Embankment height",
+    "Slope width",
+    "Soil width",
+    "Soil depth",
+    "Number of layers",
+    "Drain density",
+    "Drain depth",
+    "Construction time",
+    "First consolidation staged",
+    "First consolidation time",
+    "First consolidation max steps",
+    "End of consolidation staged",
+    "End of consolidation time",
+    "End of consolidation max steps",
+    "Mean log(k_x)",
+    "Mean log(k_y)",
+    "Mean λ*",
+    "Mean κ*",
+    "Embankment unit weight",
+]
+
+
+def _get_value(value: float) -> float:
+    """Material fields that do not apply to the soil model are empty"""
+    return 0.0 if value is None else float(value)
+
+
+def _get_phase_features(staging: dict, calculation: dict, phase_key: str) -> List[float]:
+    """Loading type, time interval and step limit of a consolidation phase. A phase with a minimum excess pore pressure
+    as loading type has no time interval"""
+    is_staged = staging[phase_key].get("loading_type") == "Staged construction"
+    return [
+        float(is_staged),
+        staging[phase_key]["time_interval"] if is_staged else 0.0,
+        calculation.get(phase_key, {}).get("max_steps", PLAXIS_DEFAULT_MAX_STEPS),
+    ]
+
+
+def get_surrogate_features(json_input: str, json_materials: str) -> List[float]:
+    """Features of the design, staging and material parameters of an analysis, in the order of FEATURE_NAMES. Material
+    properties of the soil layers are averaged, weighted by the layer thickness"""
+    worker_input = json.loads(json_input)
+    geometry = worker_input["geometry_tab"]
+    staging = worker_input["staging_tab"]
+    calculation = worker_input.get("calculation_tab", {})
+    embankment_material, *layer_materials = json.loads(json_materials)
+    thicknesses = np.array([layer["thickness"] for layer in geometry["soil"]["layers"]], dtype=float)
+    weights = thicknesses / thicknesses.sum()
+    layer_properties = np.array(
+        [
+            [
+                np.log10(max(_get_value(material["groundwater"]["perm_primary_horizontal_axis"]), 1e-12)),
+                np.log10(max(_get_value(material["groundwater"]["perm_vertical_axis"]), 1e-12)),
+                _get_value(material["param"].get("lambdaModified")),
+                _get_value(material["param"].get("kappaModified")),
+            ]
+            for material in layer_materials
+        ]
+    )
+    drain = geometry["drain"]
+    return [
+        geometry["embankment"]["width"],
+        geometry["embankment"]["height"],
+        geometry["embankment"]["slope_width"],
+        geometry["soil"]["width"],
+        float(thicknesses.sum()),
+        len(thicknesses),
+        1.0 / drain["spacing"] if drain["selector"] else 0.0,
+        float(thicknesses[: drain["depth"]].sum()) if drain["selector"] else 0.0,
+        staging["first_construction"]["time_interval"] + staging["second_construction"]["time_interval"],
+        *_get_phase_features(staging, calculation, "first_consolidation"),
+        *_get_phase_features(staging, calculation, "end_of_consolidation"),
+        *(weights @ layer_properties).tolist(),
+        _get_value(embankment_material["general"]["gammaUnsat"]),
+    ]
+
+
+def resample_curve(time: List[float], p_excess: List[float]) -> np.ndarray:
+    """Resample a P_excess-vs-time curve on the common time grid"""
+    return np.interp(TIME_GRID, np.asarray(time, dtype=float), np.asarray(p_excess, dtype=float))
+
+
+def get_dataset() -> List[dict]:
+    """Return the analyses in this workspace that the surrogate model is trained on. Analyses that were recorded with
+    other features are skipped"""
+    try:
+        records = json.loads(Storage().get(DATASET_STORAGE_KEY, scope="workspace").getvalue())
+    except FileNotFoundError:
+        return []
+    return [record for record in records if len(record["features"]) == len(FEATURE_NAMES)]
+
+
+def add_dataset_records(new_records: List[dict]) -> None:
+    """Add analyses to the dataset. Records with the same input hash as a new record are replaced"""
+    new_hashes = {record["input_hash"] for record in new_records}
+    records = [record for record in get_dataset() if record["input_hash"] not in new_hashes] + new_records
+    records = records[-MAX_DATASET_RECORDS:]
+    Storage().set(DATASET_STORAGE_KEY, data=File.from_data(json.dumps(records)), scope="workspace")
+
+
+class SurrogatePrediction(NamedTuple):
+    """Predicted P_excess on the TIME_GRID, with its standard deviation"""
+
+    p_excess: np.ndarray
+    std: np.ndarray
+    in_envelope: bool
+    outside_features: List[str]
+
+
+def _rbf_kernel(x_1: np.ndarray, x_2: np.ndarray, length_scale: float) -> np.ndarray:
+    squared_distances = ((x_1[:, np.newaxis, :] - x_2[np.newaxis, :, :]) ** 2).sum(axis=-1)
+    return np.exp(-0.5 * squared_distances / length_scale**2)
+
+
+class _FittedModel(NamedTuple):
+    """Parameters of a fitted surrogate model, see SurrogateModel"""
+
+    feature_min: np.ndarray
+    feature_max: np.ndarray
+    feature_mean: np.ndarray
+    feature_std: np.ndarray
+    x_train: np.ndarray  # Standardised features of the training designs
+    curve_mean: np.ndarray
+    components: np.ndarray
+    score_std: np.ndarray
+    length_scale: float
+    cholesky: np.ndarray  # Cholesky factor of the kernel matrix of the training designs
+    alpha: np.ndarray  # Weights of the training designs in the predicted normalised scores
+
+
+def _select_length_scale(x_train: np.ndarray, normalized_scores: np.ndarray) -> Tuple[float, np.ndarray, np.ndarray]:
+    """Select the length scale with the highest log marginal likelihood, summed over the components. Return it with
+    the Cholesky factor of its kernel matrix and the weights of the training designs"""
+    n_components = normalized_scores.shape[1]
+    best_likelihood = -np.inf
+    best = None
+    for length_scale in LENGTH_SCALES:
+        kernel = _rbf_kernel(x_train, x_train, length_scale) + NOISE * np.eye(len(x_train))
+        cholesky = np.linalg.cholesky(kernel)
+        alpha = np.linalg.solve(cholesky.T, np.linalg.solve(cholesky, normalized_scores))
+        likelihood = -0.5 * np.sum(normalized_scores * alpha) - n_components * np.sum(np.log(np.diag(cholesky)))
+        if likelihood > best_likelihood:
+            best_likelihood = likelihood
+            best = (length_scale, cholesky, alpha)
+    return best
+
+
+def _fit_model(features: np.ndarray, curves: np.ndarray) -> _FittedModel:
+    """Standardise the features, reduce the curves to their principal components and fit the Gaussian processes of
+    the component scores"""
+    feature_std = np.where(features.std(axis=0) > 0, features.std(axis=0), 1.0)
+    x_train = (features - features.mean(axis=0)) / feature_std
+    # Reduced basis of the curves
+    curve_mean = curves.mean(axis=0)
+    _, singular_values, components = np.linalg.svd(curves - curve_mean, full_matrices=False)
+    explained = np.cumsum(singular_values**2) / max(np.sum(singular_values**2), 1e-12)
+    components = components[: min(int(np.searchsorted(explained, EXPLAINED_VARIANCE)) + 1, MAX_COMPONENTS)]
+    scores = (curves - curve_mean) @ components.T
+    score_std = np.where(scores.std(axis=0) > 0, scores.std(axis=0), 1.0)
+    return _FittedModel(
+        features.min(axis=0),
+        features.max(axis=0),
+        features.mean(axis=0),
+        feature_std,
+        x_train,
+        curve_mean,
+        components,
+        score_std,
+        *_select_length_scale(x_train, scores / score_std),
+    )
+
+
+class SurrogateModel:
+    """Reduced-basis Gaussian-process model of the P_excess curve.
+
+    The curves of the dataset are reduced to their principal components. The scores of each component are modelled
+    with a Gaussian process on the standardised features, sharing a squared-exponential kernel of which the length
+    scale maximises the marginal likelihood.
+    """
+
+    def __init__(self, records: List[dict]):
+        if len(records) < MIN_DATASET_RECORDS:
+            raise UserError(
+                f"The surrogate model needs at least {MIN_DATASET_RECORDS} PLAXIS analyses in this workspace, "
+                f"{len(records)} are available"
+            )
+        self.fit = _fit_model(
+            np.array([record["features"] for record in records], dtype=float),
+            np.array([record["p_excess"] for record in records], dtype=float),
+        )
+
+    def predict(self, features: List[float]) -> SurrogatePrediction:
+        """Predict the P_excess curve of a design, and check whether it lies within the training envelope"""
+        fit = self.fit
+        features = np.asarray(features, dtype=float)
+        margin = ENVELOPE_MARGIN * (fit.feature_max - fit.feature_min)
+        outside = (features < fit.feature_min - margin) | (features > fit.feature_max + margin)
+        x = ((features - fit.feature_mean) / fit.feature_std)[np.newaxis, :]
+        kernel_cross = _rbf_kernel(x, fit.x_train, fit.length_scale)
+        normalized_scores = kernel_cross @ fit.alpha
+        v = np.linalg.solve(fit.cholesky, kernel_cross.T)
+        relative_variance = float(max(1.0 - np.sum(v**2), 0.0))
+        scores = normalized_scores[0] * fit.score_std
+        score_variance = relative_variance * fit.score_std**2
+        return SurrogatePrediction(
+            p_excess=fit.curve_mean + scores @ fit.components,
+            std=np.sqrt(score_variance @ fit.components**2),
+            in_envelope=not outside.any() and relative_variance <= MAX_RELATIVE_VARIANCE,
+            outside_features=[name for name, is_outside in zip(FEATURE_NAMES, outside) if is_outside],
+        )
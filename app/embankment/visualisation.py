@@ -24,18 +24,22 @@ from viktor.geometry import Material
 from viktor.geometry import Point
 from viktor.geometry import Polygon
 
+from app.embankment.domain import get_drain_errors
+from app.embankment.domain import get_soil_width
+
 
 def _check_params(params: Munch) -> None:
     err_list = []
     if (
         params.geometry_tab.embankment.width + params.geometry_tab.embankment.slope_width * 2
-        > params.geometry_tab.soil.width / 1.5
+        > get_soil_width(params.geometry_tab) / 1.5
     ):
         err_list.append("The soil width needs to be at least 1.5 as large as the total embankment width")
     if not all(
         [params.geometry_tab.embankment.material, *[layer.material for layer in params.geometry_tab.soil.layers]]
     ):
         err_list.append("Please make sure materials are defined for the embankment and soil layers")
+    err_list.extend(get_drain_errors(params.geometry_tab))
     if err_list:
         raise UserError(". ".join(err_list))
 
@@ -65,8 +69,9 @@ def get_embankment_geometry_group(params: Munch) -> Group:
         ),
     )
     # Create the soil layers
-    soil_x_min = params.geometry_tab.soil.width / -2.0
-    soil_x_max = params.geometry_tab.soil.width / 2.0
+    soil_width = get_soil_width(params.geometry_tab)
+    soil_x_min = soil_width / -2.0
+    soil_x_max = soil_width / 2.0
     layers = []
     depth = 0
     for layer in params.geometry_tab.soil.layers:
@@ -15,7 +15,22 @@ SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+from munch import Munch
+from viktor import UserError
+from viktor.api_v1 import API
 from viktor.core import ViktorController
+from viktor.views import DataGroup
+from viktor.views import DataItem
+from viktor.views import DataResult
+from viktor.views import DataView
+from viktor.views import PlotlyResult
+from viktor.views import PlotlyView
+
+from app.embankment.analysis import get_results
+from app.embankment.analysis import has_selected_materials
+from app.embankment.plotting import get_p_excess_figure
+from app.embankment.scheduler import get_queue_summary
+from app.embankment_folder.parametrization import EmbankmentFolderParametrization
 
 
 class EmbankmentFolderController(ViktorController):
@@ -26,4 +41,52 @@ class EmbankmentFolderController(ViktorController):
     label = "Embankment folder"
     children = ["Embankment"]
     show_children_as = "Cards"  # or 'Table'
+    parametrization = EmbankmentFolderParametrization
     viktor_enforce_field_constraints = True
+
+    @PlotlyView("Comparison", duration_guess=300)
+    def compare_embankments(self, params: Munch, entity_id: int, **kwargs: dict) -> PlotlyResult:
+        """Overlay the PLAXIS results of the embankments in this folder. Only designs without a stored result are
+        analysed, in parallel"""
+        embankments = params.comparison_tab.embankments or API().get_entity(entity_id).children(
+            entity_type_names=["Embankment"]
+        )
+        incomplete = [
+            embankment.name for embankment in embankments if not has_selected_materials(embankment.last_saved_params)
+        ]
+        embankments = [embankment for embankment in embankments if has_selected_materials(embankment.last_saved_params)]
+        if not embankments:
+            raise UserError(f"Select the materials of these embankments first: {', '.join(incomplete)}")
+        outputs = get_results(embankments)
+        fig = get_p_excess_figure(
+            {embankment.name: outputs[embankment.id] for embankment in embankments if embankment.id in outputs}
+        )
+        superseded = [embankment.name for embankment in embankments if embankment.id not in outputs]
+        skipped = []  # The other embankments are shown, and the skipped ones are listed
+        if incomplete:
+            skipped.append(f"Not analysed, as materials are missing: {', '.join(incomplete)}")
+        if superseded:
+            skipped.append(f"Not analysed, as a newer analysis superseded it: {', '.join(superseded)}")
+        if skipped:
+            fig.update_layout(title="<br>".join(skipped))
+        return PlotlyResult(fig.to_json())
+
+    @DataView("Worker queue", duration_guess=1)
+    def show_worker_queue(self, params: Munch, **kwargs: dict) -> DataResult:
+        """Show the analyses that are waiting for and running on the PLAXIS worker, and the recent waiting times"""
+        summary = get_queue_summary()
+        priority_items = [
+            DataItem(
+                priority.capitalize(),
+                None,
+                subgroup=DataGroup(
+                    DataItem("Queued", priority_summary["queued"]),
+                    DataItem("Running", priority_summary["running"]),
+                    DataItem("Mean waiting time", priority_summary["mean_wait"], suffix="s", number_of_decimals=0),
+                    DataItem("90% waiting time", priority_summary["p90_wait"], suffix="s", number_of_decimals=0),
+                ),
+            )
+            for priority, priority_summary in summary.items()
+        ]
+        queue_depth = sum(priority_summary["queued"] for priority_summary in summary.values())
+        return DataResult(DataGroup(DataItem("Queue depth", queue_depth), *priority_items))
@@ -16,9 +16,15 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 SOFTWARE.
 """
 
+import hashlib
 import json
+import os
+import shutil
 import subprocess
+import sys
+import tempfile
 import time
+import zipfile
 from pathlib import Path
 from typing import Dict
 from typing import List
@@ -28,16 +34,82 @@ import numpy as np
 from munch import munchify
 from plxscripting.easy import new_server
 
+start_time = time.perf_counter()  # The run time is reported to the app, which uses it to predict the next run times
+
 # Define the paths where the json files are created. This is with respect to the current working directory of the VIKTOR
 # worker
 path_input_json = Path(__file__).parent / "input.json"
 path_materials_json = Path(__file__).parent / "materials.json"
 path_output_json = Path(__file__).parent / "output.json"
+path_job_json = Path(__file__).parent / "job.json"  # Only sent along with a baseline project
+path_baseline_project_zip = Path(__file__).parent / "baseline_project.zip"
+path_project_zip = Path(__file__).parent / "project.zip"
+path_project_dir = Path(__file__).parent / "project"
+path_project = path_project_dir / "embankment.p2dx"
+path_artifacts_json = Path(__file__).parent / "artifacts.json"
+path_calculation_json = Path(__file__).parent / "calculation.json"
+
+# Job files that were sent before are not sent again, but referred to by their content hash. The worker keeps these in
+# an artifact cache, of which the least recently used files are removed when it exceeds the maximum size.
+ARTIFACT_CACHE_DIR = Path(tempfile.gettempdir()) / "viktor-plaxis-artifacts"
+MAX_ARTIFACT_CACHE_SIZE = 5 * 1024**3  # [bytes]
+
+
+def cache_artifact(path: Path, artifact_hash: str) -> None:
+    """Store a file in the artifact cache under its content hash, and mark it as recently used"""
+    ARTIFACT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cache_path = ARTIFACT_CACHE_DIR / artifact_hash
+    if not cache_path.exists():
+        temporary_path = cache_path.with_suffix(f".{os.getpid()}.tmp")  # Jobs may run in parallel
+        shutil.copyfile(path, temporary_path)
+        os.replace(temporary_path, cache_path)
+    os.utime(cache_path)
+
+
+def resolve_artifacts(artifacts: Dict[str, str]) -> List[str]:
+    """Store the sent artifacts in the cache, and copy the referenced artifacts from the cache to the job directory.
+    Return the hashes of the artifacts that are neither sent nor cached"""
+    ARTIFACT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    missing_artifacts = []
+    for file_name, artifact_hash in artifacts.items():
+        path = Path(__file__).parent / file_name
+        cache_path = ARTIFACT_CACHE_DIR / artifact_hash
+        if path.exists():
+            if cache_path.exists() or hashlib.sha256(path.read_bytes()).hexdigest() == artifact_hash:
+                cache_artifact(path, artifact_hash)
+        elif cache_path.exists():
+            shutil.copyfile(cache_path, path)
+            os.utime(cache_path)  # Mark the artifact as recently used
+        else:
+            missing_artifacts.append(artifact_hash)
+    # Remove the least recently used artifacts
+    cached_files = sorted(ARTIFACT_CACHE_DIR.iterdir(), key=lambda cached_file: cached_file.stat().st_mtime)
+    cache_size = sum(cached_file.stat().st_size for cached_file in cached_files)
+    for cached_file in cached_files:
+        if cache_size <= MAX_ARTIFACT_CACHE_SIZE:
+            break
+        cache_size -= cached_file.stat().st_size
+        cached_file.unlink(missing_ok=True)
+    return missing_artifacts
+
+
+if path_artifacts_json.exists():
+    with open(path_artifacts_json, "r", encoding="utf-8") as f:
+        missing = resolve_artifacts(json.load(f))
+    if missing:  # Let the app send the job again, including all files
+        with open(path_output_json, "w", encoding="utf-8") as f:
+            json.dump({"missing_artifacts": missing}, f)
+        sys.exit()
+
 # Open the files and store the obtained dictionaries
 with open(path_input_json, "r", encoding="utf-8") as f:
     params_embankment = json.load(f)
 with open(path_materials_json, "r", encoding="utf-8") as f:
     params_materials = json.load(f)
+calculation_config = {}
+if path_calculation_json.exists():
+    with open(path_calculation_json, "r", encoding="utf-8") as f:
+        calculation_config = json.load(f)
 
 
 # Define a function that is needed to convert input parameters to a suitable PLAXIS-material-input
@@ -167,6 +239,64 @@ ORDERED_MATERIAL_KEYS = [
     "Einc",
     "CVRef",
 ]
+# Keys of the calculation phases in the staging and calculation tabs, in the order in which they are calculated. These
+# are the same as the PHASE_KEYS of the app
+PHASE_KEYS = ["first_construction", "first_consolidation", "second_construction", "end_of_consolidation"]
+DEFAULT_SOLVER = "Picos (multicore iterative)"
+
+
+def set_staging(calculation_phases: list, staging_parameters: Dict) -> None:
+    """Set the loading type and time interval of the calculation phases, which are in the order of the PHASE_KEYS"""
+    for calculation_phase, phase_key in zip(calculation_phases, PHASE_KEYS):
+        loading_type = staging_parameters[phase_key].get("loading_type", "Staged construction")
+        calculation_phase.Deform.LoadingType = loading_type
+        if loading_type == "Staged construction":
+            calculation_phase.TimeInterval = staging_parameters[phase_key]["time_interval"]
+
+
+def get_drain_locations(geometry: Dict) -> np.ndarray:
+    """Return the x-coordinates of the drains. The drain settings are validated by the app before the job is sent, see
+    get_drain_errors in app/embankment/domain.py"""
+    drain = geometry["drain"]
+    if not drain["selector"]:
+        return np.array([])
+    assert drain["spacing"] > 0, f"The drain spacing must be positive, got {drain['spacing']} m"
+    n_layers = len(geometry["soil"]["layers"])
+    assert 1 <= drain["depth"] <= n_layers, f"The drains must end in one of the {n_layers} layers, got {drain['depth']}"
+    footprint = geometry["embankment"]["width"] / 2.0 + geometry["embankment"]["slope_width"]
+    return np.arange(drain["spacing"] / 2.0, footprint, drain["spacing"])
+
+
+def get_max_cores(config: Dict) -> int:
+    """Number of cores per calculation. Unless set, the cores of the worker are divided between the analyses that it
+    runs at the same time, such that these do not oversubscribe the machine"""
+    if config.get("max_cores"):
+        return config["max_cores"]
+    return max((os.cpu_count() or 1) // config.get("concurrency", 1), 1)
+
+
+def set_calculation_settings(
+    calculation_phases: list, calculation_parameters: Dict, max_cores: int, first_calculated_phase: int
+) -> None:
+    """Set the number of cores, the solver type and the iteration limits of the phases that are calculated, which are
+    in the order of the PHASE_KEYS. Settings that are not given are reset to the defaults of PLAXIS, as a saved project
+    may hold the settings of an earlier analysis"""
+    for calculation_phase, phase_key in list(zip(calculation_phases, PHASE_KEYS))[first_calculated_phase:]:
+        calculation_phase.MaxCores = max_cores
+        calculation_phase.Solver = calculation_parameters.get("solver", DEFAULT_SOLVER)
+        phase_limits = calculation_parameters.get(phase_key, {})
+        calculation_phase.Deform.UseDefaultIterationParams = not phase_limits
+        if "max_steps" in phase_limits:
+            calculation_phase.Deform.MaxSteps = phase_limits["max_steps"]
+        if "max_iterations" in phase_limits:
+            calculation_phase.Deform.MaxIterations = phase_limits["max_iterations"]
+
+
+drain_locations = get_drain_locations(params_embankment["geometry_tab"])
+# Repeated structures are created in bulk, which saves scripting round trips. The number saved is reported to the app
+geometry_round_trips_saved = 0
+
+max_cores_per_calculation = get_max_cores(calculation_config)
 
 # Open PLAXIS and start server. Specify PLAXIS path on server.
 PLAXIS_PATH = r"C:\Program Files\Bentley\Geotechnical\PLAXIS 2D CONNECT Edition V21\\Plaxis2DXInput.exe"
@@ -181,42 +311,52 @@ with subprocess.Popen(
     # Start the scripting server.
     s_i, g_i = new_server("localhost", PORT_I, password=PASSWORD)
     s_o, g_o = new_server("localhost", PORT_O, password=PASSWORD)
-    s_i.new()  # Start a new project
-
-    # Add soil materials. This must be done in a specific order to ensure the materials are set correctly
-    materials = {}  # Make a dict to be able to refer to the materials by name
-    for i, params_material in enumerate(params_materials):
-        material_zip_list = []
-        material_flattened_dict = get_deepest_dict(
-            params_material
-        )  # Get the deepest items from the material parameters dict
-        for (
-            material_key
-        ) in ORDERED_MATERIAL_KEYS:  # Use a specific material key order such that the settings are set correctly
-            if material_key in material_flattened_dict:
-                material_zip_list.append((material_key, material_flattened_dict[material_key]))
-        material = g_i.soilmat(material_zip_list[0])
-        for material_zip in material_zip_list[1:]:
-            material.setproperties(*material_zip)  # Set all the properties of the material in an iterative fashion
-        materials.update({material_flattened_dict["MaterialName"]: material})
-
-    embankment_parameters = munchify(params_embankment["geometry_tab"]["embankment"])
-    soil_parameters = munchify(params_embankment["geometry_tab"]["soil"])
-    drain_parameters = munchify(params_embankment["geometry_tab"]["drain"])
-    layer_thicknesses = [layer.thickness for layer in soil_parameters.layers]
-    soil_depth = -1 * sum(layer_thicknesses)
-    g_i.SoilContour.initializerectangular(0, soil_depth, soil_parameters.width, embankment_parameters.height)
-    borehole = g_i.borehole(0)
-    layers = [g_i.soillayer(layer.thickness) for layer in soil_parameters.layers]
-    borehole.Head = -1  # Water level is at -1 m
-    _ = [
-        g_i.setmaterial(soil, materials[layer.material.name]) for soil, layer in zip(g_i.Soils, soil_parameters.layers)
-    ]
-    g_i.gotostructures()
-    # Define the points of the embankment structure
-    point_list = [
-        g_i.point(x, y)
-        for x, y in [
+    if path_baseline_project_zip.exists():
+        # The model of this embankment was calculated before: only recalculate the phases of which the staging changed
+        with zipfile.ZipFile(path_baseline_project_zip) as baseline_project_zip:
+            baseline_project_zip.extractall(path_project_dir)
+        with open(path_job_json, "r", encoding="utf-8") as f:
+            recalculate_from_phase = json.load(f)["recalculate_from_phase"]
+        s_i.open(str(path_project))
+        g_i.gotostages()
+        phases = list(g_i.Phases)[1:]
+    else:
+        s_i.new()  # Start a new project
+
+        # Add soil materials. This must be done in a specific order to ensure the materials are set correctly
+        materials = {}  # Make a dict to be able to refer to the materials by name
+        for i, params_material in enumerate(params_materials):
+            material_zip_list = []
+            material_flattened_dict = get_deepest_dict(
+                params_material
+            )  # Get the deepest items from the material parameters dict
+            for (
+                material_key
+            ) in ORDERED_MATERIAL_KEYS:  # Use a specific material key order such that the settings are set correctly
+                if material_key in material_flattened_dict:
+                    material_zip_list.append((material_key, material_flattened_dict[material_key]))
+            material = g_i.soilmat(material_zip_list[0])
+            for material_zip in material_zip_list[1:]:
+                material.setproperties(*material_zip)  # Set all the properties of the material in an iterative fashion
+            materials.update({material_flattened_dict["MaterialName"]: material})
+
+        embankment_parameters = munchify(params_embankment["geometry_tab"]["embankment"])
+        soil_parameters = munchify(params_embankment["geometry_tab"]["soil"])
+        drain_parameters = munchify(params_embankment["geometry_tab"]["drain"])
+        layer_thicknesses = [layer.thickness for layer in soil_parameters.layers]
+        soil_depth = -1 * sum(layer_thicknesses)
+        g_i.SoilContour.initializerectangular(0, soil_depth, soil_parameters.width, embankment_parameters.height)
+        borehole = g_i.borehole(0)
+        layers = [g_i.soillayer(layer.thickness) for layer in soil_parameters.layers]
+        borehole.Head = -1  # Water level is at -1 m
+        _ = [
+            g_i.setmaterial(soil, materials[layer.material.name])
+            for soil, layer in zip(g_i.Soils, soil_parameters.layers)
+        ]
+        g_i.gotostructures()
+        # Define the points of the embankment structure. The polygons are created from the coordinates directly, instead
+        # of creating the points separately first
+        point_list = [
             (0, embankment_parameters.height),
             (embankment_parameters.width / 2.0, embankment_parameters.height),
             (
@@ -227,70 +367,97 @@ with subprocess.Popen(
             (0, 0),
             (embankment_parameters.width / 2.0 + embankment_parameters.slope_width, 0),
         ]
-    ]
-    # Always draw the bottom layer first, as it otherwise does not connect
-    embankment_bottom_layer = g_i.polygon(*point_list[2:])[0]  # Last four points are the bottom layer
-    embankment_top_layer = g_i.polygon(*point_list[:4])[0]  # First four points are the top layer
-    # Set the proper materials on the embankment layers
-    g_i.setmaterial(embankment_top_layer.Soil, materials[embankment_parameters.material.name])
-    g_i.setmaterial(embankment_bottom_layer.Soil, materials[embankment_parameters.material.name])
-    if drain_parameters.selector:  # If drains are enabled
-        _ = [  # Set the drain depth to just above the end of the selected layer
-            g_i.drain((x, 0), (x, (-1 + 1e-7) * sum(layer_thicknesses[: drain_parameters.depth])))
-            for x in np.arange(
-                drain_parameters.spacing / 2.0,
-                embankment_parameters.width / 2.0 + embankment_parameters.slope_width,
-                drain_parameters.spacing,
-            )
+        geometry_round_trips_saved += len(point_list)
+        # Always draw the bottom layer first, as it otherwise does not connect
+        embankment_bottom_layer = g_i.polygon(*point_list[2:])[0]  # Last four points are the bottom layer
+        embankment_top_layer = g_i.polygon(*point_list[:4])[0]  # First four points are the top layer
+        # Set the proper materials on the embankment layers
+        g_i.setmaterial(embankment_top_layer.Soil, materials[embankment_parameters.material.name])
+        g_i.setmaterial(embankment_bottom_layer.Soil, materials[embankment_parameters.material.name])
+        if drain_locations.size:  # If drains are enabled
+            # Create the first drain, with its depth just above the end of the selected layer, and copy its line to the
+            # other drain locations in a single array operation
+            drain_objects = g_i.drain(
+                (drain_locations[0], 0),
+                (drain_locations[0], (-1 + 1e-7) * sum(layer_thicknesses[: drain_parameters.depth])),
+            )  # The created points, line and drain
+            if drain_locations.size > 1:
+                g_i.arrayr(drain_objects[2], int(drain_locations.size), (drain_parameters.spacing, 0))
+                geometry_round_trips_saved += int(drain_locations.size) - 2
+        g_i.gotomesh()
+        g_i.mesh(0.06)
+        g_i.gotostages()
+        # Set the phases
+        phase_0 = g_i.Phases[0]
+        g_i.GroundwaterFlow.BoundaryXMin.set(phase_0, "Closed")
+        g_i.GroundwaterFlow.BoundaryYMin.set(phase_0, "Open")
+        phase_names = [  # Define the names of the phases
+            "First embankment construction",
+            "First consolidation",
+            "Second embankment construction",
+            "End of consolidation",
         ]
-    g_i.gotomesh()
-    g_i.mesh(0.06)
-    g_i.gotostages()
-    # Set the phases
-    phase_0 = g_i.Phases[0]
-    g_i.GroundwaterFlow.BoundaryXMin.set(phase_0, "Closed")
-    g_i.GroundwaterFlow.BoundaryYMin.set(phase_0, "Open")
-    phase_names = [  # Define the names of the phases
-        "First embankment construction",
-        "First consolidation",
-        "Second embankment construction",
-        "End of consolidation",
-    ]
-    phase_1 = g_i.phase(phase_0)
-    phase_1.Identification = phase_names[0]
-    phase_1.DeformCalcType = "Consolidation"
-    phase_1.TimeInterval = 2  # Phase takes two days
-    g_i.activate(embankment_bottom_layer, phase_1)
-    if drain_parameters.selector:  # If drains are enabled
-        g_i.activate(g_i.Drains, phase_1)
-    phase_2 = g_i.phase(phase_1)
-    phase_2.Identification = phase_names[1]
-    phase_2.DeformCalcType = "Consolidation"
-    # Use P_Excess as exit condition for automatic phase length determination. This is not the same as in tutorial 08!
-    phase_2.Deform.LoadingType = "Minimum excess pore pressure"
-    phase_3 = g_i.phase(phase_2)
-    phase_3.Identification = phase_names[2]
-    phase_3.DeformCalcType = "Consolidation"
-    phase_3.TimeInterval = 1
-    g_i.activate(embankment_top_layer, phase_3)
-    phase_4 = g_i.phase(phase_3)
-    phase_4.Identification = phase_names[3]
-    phase_4.DeformCalcType = "Consolidation"
-    phase_4.Deform.LoadingType = "Minimum excess pore pressure"
-    g_i.selectmeshpoints()
-    g_o.addcurvepoint("Node", g_o.Soils[0][0], (0, -1 * layer_thicknesses[0]))
-    g_o.update()
+        phase_1 = g_i.phase(phase_0)
+        phase_1.Identification = phase_names[0]
+        phase_1.DeformCalcType = "Consolidation"
+        g_i.activate(embankment_bottom_layer, phase_1)
+        if drain_locations.size:  # If drains are enabled
+            g_i.activate(g_i.Drains, phase_1)
+        phase_2 = g_i.phase(phase_1)
+        phase_2.Identification = phase_names[1]
+        phase_2.DeformCalcType = "Consolidation"
+        phase_3 = g_i.phase(phase_2)
+        phase_3.Identification = phase_names[2]
+        phase_3.DeformCalcType = "Consolidation"
+        g_i.activate(embankment_top_layer, phase_3)
+        phase_4 = g_i.phase(phase_3)
+        phase_4.Identification = phase_names[3]
+        phase_4.DeformCalcType = "Consolidation"
+        g_i.selectmeshpoints()
+        g_o.addcurvepoint("Node", g_o.Soils[0][0], (0, -1 * layer_thicknesses[0]))
+        g_o.update()
+        phases = [phase_1, phase_2, phase_3, phase_4]
+        recalculate_from_phase = 0
+    # Set the staging of the phases. Phases of which the staging changes are marked for calculation by PLAXIS, which
+    # also holds for the phases that depend on them
+    set_staging(phases, params_embankment["staging_tab"])
+    # The calculation settings are only set on the recalculated phases, such that the results of the other phases of a
+    # saved project are kept
+    set_calculation_settings(
+        phases, params_embankment.get("calculation_tab", {}), max_cores_per_calculation, recalculate_from_phase
+    )
+    for phase in phases[recalculate_from_phase:]:
+        phase.ShouldCalculate = True
     g_i.calculate()
+    path_project_dir.mkdir(exist_ok=True)
+    g_i.save(str(path_project))  # The project is returned to the app, to be reused when only the staging changes
 
     # Read the output
     steps_time = []
     steps_p_excess = []
+    steps_phase = []  # Index of the phase of each step, used to derive the consolidation metrics per phase
     g_i.view(g_i.Phases[-1])  # Starts output window
-    for step in g_o.Steps:
-        steps_p_excess.append(g_o.getcurveresults(g_o.CurvePoints[0], step, g_o.ResultTypes.Soil.PExcess))
-        steps_time.append(step.Reached.Time.value)
+    for phase_index, phase in enumerate(g_o.Phases):
+        for step in phase.Steps:
+            steps_p_excess.append(g_o.getcurveresults(g_o.CurvePoints[0], step, g_o.ResultTypes.Soil.PExcess))
+            steps_time.append(step.Reached.Time.value)
+            steps_phase.append(phase_index)
     g_o.close()  # Close the output window
     g_i.kill()  # Close the input window
 
 with open(path_output_json, "w", encoding="utf-8") as f:  # Save the output in a json file to be returned by the worker
-    json.dump({"time": steps_time, "p_excess": steps_p_excess}, f)
+    json.dump(
+        {
+            "time": steps_time,
+            "p_excess": steps_p_excess,
+            "phase": steps_phase,
+            "duration": time.perf_counter() - start_time,
+            "geometry_round_trips_saved": geometry_round_trips_saved,
+            "max_cores": max_cores_per_calculation,
+        },
+        f,
+    )
+# Return the saved project
+shutil.make_archive(str(path_project_zip.with_suffix("")), "zip", path_project_dir)
+# The app sends the saved project back as baseline when only the staging changes, which is then found in the cache
+cache_artifact(path_project_zip, hashlib.sha256(path_project_zip.read_bytes()).hexdigest())
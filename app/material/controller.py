@@ -15,12 +15,41 @@ SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+from typing import Dict
+from typing import List
 
+from munch import Munch
+from viktor.api_v1 import API
+from viktor.api_v1 import Entity
 from viktor.core import ViktorController
+from viktor.errors import EntityNotFoundError
+from viktor.views import DataGroup
+from viktor.views import DataItem
+from viktor.views import DataResult
+from viktor.views import DataStatus
+from viktor.views import DataView
 
+from app.embankment.analysis import delete_stored_result
+from app.embankment.dependencies import get_dependents
+from app.embankment.dependencies import get_material_hash
+from app.embankment.dependencies import remove_dependents
 from app.material.parametrization import MaterialParametrization
 
 
+def _get_embankments(embankment_ids: List[int]) -> Dict[int, Entity]:
+    """Embankment entities by id. Embankments that have been deleted are removed from the dependency index"""
+    embankments = {}
+    for embankment_id in embankment_ids:
+        try:
+            embankments[embankment_id] = API().get_entity(embankment_id)
+        except EntityNotFoundError:
+            continue
+    deleted_ids = [embankment_id for embankment_id in embankment_ids if embankment_id not in embankments]
+    if deleted_ids:
+        remove_dependents(deleted_ids)
+    return embankments
+
+
 class MaterialController(ViktorController):
     """
     Controller to set material parameters
@@ -29,3 +58,37 @@ class MaterialController(ViktorController):
     label = "Material"
     parametrization = MaterialParametrization
     viktor_enforce_field_constraints = True
+
+    @DataView("Dependent analyses", duration_guess=2)
+    def show_dependent_analyses(self, params: Munch, entity_id: int, **kwargs: dict) -> DataResult:
+        """List the embankments of which the stored result depends on this material, and whether it is outdated"""
+        material = API().get_entity(entity_id)
+        dependents = get_dependents(entity_id, get_material_hash(material.last_saved_params))
+        embankments = _get_embankments(list(dependents))
+        dependents = {
+            embankment_id: outdated for embankment_id, outdated in dependents.items() if embankment_id in embankments
+        }
+        dependent_items = [
+            DataItem(
+                embankments[embankment_id].name,
+                "Outdated" if outdated else "Up to date",
+                status=DataStatus.WARNING if outdated else DataStatus.SUCCESS,
+            )
+            for embankment_id, outdated in dependents.items()
+        ]
+        n_outdated = sum(dependents.values())
+        return DataResult(
+            DataGroup(
+                DataItem("Dependent analyses", len(dependents), subgroup=DataGroup(*dependent_items)),
+                DataItem("Outdated", n_outdated, status=DataStatus.WARNING if n_outdated else DataStatus.SUCCESS),
+            )
+        )
+
+    def invalidate_dependents(self, params: Munch, entity_id: int, **kwargs: dict) -> None:
+        """Delete the stored results that were obtained with an earlier saved version of this material"""
+        material = API().get_entity(entity_id)
+        dependents = get_dependents(entity_id, get_material_hash(material.last_saved_params))
+        embankments = _get_embankments([embankment_id for embankment_id, outdated in dependents.items() if outdated])
+        for embankment in embankments.values():
+            delete_stored_result(embankment)
+        remove_dependents(list(embankments))
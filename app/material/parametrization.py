@@ -16,12 +16,14 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 SOFTWARE.
 """
 from viktor import Color
+from viktor.parametrization import ActionButton
 from viktor.parametrization import LineBreak
 from viktor.parametrization import NumberField
 from viktor.parametrization import OptionField
 from viktor.parametrization import OptionListElement
 from viktor.parametrization import Parametrization
 from viktor.parametrization import Tab
+from viktor.parametrization import Text
 from viktor.parametrization import TextField
 
 from app.embankment.constants import COLORS
@@ -169,3 +171,8 @@ class MaterialParametrization(Parametrization):
         ui_name="POP",
         description="Pre-overburden pressure",
         suffix="kN / m^2")
+    analyses = Tab("Analyses")
+    analyses.text = Text(
+        "Stored PLAXIS results of embankments that were analysed with an earlier saved version of this material are "
+        "outdated. Save the material first, and check the 'Dependent analyses' view for the outdated results.")
+    analyses.invalidate_button = ActionButton("Invalidate outdated results", method="invalidate_dependents")
@@ -15,7 +15,37 @@ SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from munch import Munch
+from munch import unmunchify
+from viktor import UserError
+from viktor.api_v1 import API
 from viktor.core import ViktorController
+from viktor.result import DownloadResult
+from viktor.views import DataGroup
+from viktor.views import DataItem
+from viktor.views import DataResult
+from viktor.views import DataStatus
+from viktor.views import DataView
+
+from app.material_folder.library import MAX_REPORTED_ERRORS
+from app.material_folder.library import get_library_csv
+from app.material_folder.library import get_library_json
+from app.material_folder.library import read_library
+from app.material_folder.library import validate_materials
+from app.material_folder.parametrization import MaterialFolderParametrization
+
+ENTITY_CREATION_BATCH_SIZE = 10  # Number of material entities that is created concurrently
+
+
+def _get_library_materials(params: Munch) -> List[dict]:
+    """Read the materials from the uploaded material library"""
+    library_file = params.library.import_section.file
+    if library_file is None:
+        raise UserError("Upload a material library first")
+    return read_library(library_file.filename, library_file.file.getvalue_binary())
 
 
 class MaterialFolderController(ViktorController):
@@ -26,4 +56,55 @@ class MaterialFolderController(ViktorController):
     label = "Material folder"
     children = ["Material"]
     show_children_as = "Table"  # or 'Cards'
+    parametrization = MaterialFolderParametrization
     viktor_enforce_field_constraints = True
+
+    @DataView("Library validation", duration_guess=2)
+    def validate_library(self, params: Munch, entity_id: int, **kwargs: dict) -> DataResult:
+        """Validate all materials of the uploaded library and list every error"""
+        materials = _get_library_materials(params)
+        existing_names = [material.name for material in API().get_entity(entity_id).children(include_params=False)]
+        errors = validate_materials(materials, existing_names)
+        if not errors:
+            return DataResult(
+                DataGroup(DataItem("Materials", len(materials), status=DataStatus.SUCCESS, status_message="Valid"))
+            )
+        error_items = [DataItem("", error, status=DataStatus.ERROR) for error in errors[:MAX_REPORTED_ERRORS]]
+        if len(errors) > MAX_REPORTED_ERRORS:
+            error_items.append(DataItem("", f"... and {len(errors) - MAX_REPORTED_ERRORS} more errors"))
+        return DataResult(
+            DataGroup(
+                DataItem("Materials", len(materials)),
+                DataItem("Errors", len(errors), status=DataStatus.ERROR, subgroup=DataGroup(*error_items)),
+            )
+        )
+
+    def import_materials(self, params: Munch, entity_id: int, **kwargs: dict) -> None:
+        """Create a material entity for each material of the uploaded library, if all materials are valid"""
+        materials = _get_library_materials(params)
+        folder = API().get_entity(entity_id)
+        errors = validate_materials(materials, [material.name for material in folder.children(include_params=False)])
+        if errors:
+            raise UserError(f"The library contains {len(errors)} errors, see the 'Library validation' view")
+        # The import is undone if any material cannot be created, such that the library can be imported again
+        with ThreadPoolExecutor(max_workers=ENTITY_CREATION_BATCH_SIZE) as executor:
+            futures = [
+                executor.submit(folder.create_child, "Material", material["general"]["MaterialName"], params=material)
+                for material in materials
+            ]
+            failures = [future.exception() for future in futures if future.exception() is not None]
+            if failures:
+                created = [future.result() for future in futures if future.exception() is None]
+                list(executor.map(lambda child: child.delete(), created))
+                raise UserError(
+                    f"{len(failures)} of the {len(materials)} materials could not be created, so none have been "
+                    f"imported: {failures[0]}"
+                )
+
+    def export_materials(self, params: Munch, entity_id: int, **kwargs: dict) -> DownloadResult:
+        """Download all materials in this folder as a material library"""
+        children = API().get_entity(entity_id).children(entity_type_names=["Material"])
+        materials = [unmunchify(child.last_saved_params) for child in children]
+        if params.library.export_section.file_format == "JSON":
+            return DownloadResult(get_library_json(materials), file_name="materials.json")
+        return DownloadResult(get_library_csv(materials), file_name="materials.csv")
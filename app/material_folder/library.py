@@ -0,0 +1,256 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import csv
+import io
+import json
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+import numpy as np
+from viktor import UserError
+
+from app.embankment.constants import COLORS
+
+# Fields of the material parametrization that hold text. All other fields are numbers
+TEXT_FIELDS = {
+    "general.MaterialName",
+    "general.SoilModel",
+    "general.DrainageType",
+    "param.DefaultValuesAdvanced",
+    "groundwater.DataSetFlow",
+    "groundwater.UsdaSoilType",
+    "groundwater.UseDefaultsFlow",
+    "interfaces.InterfaceStrength",
+    "interfaces.K0Determination",
+}
+SOIL_MODELS = ["Hardening Soil", "Soft Soil"]
+DRAINAGE_TYPES = ["Drained", "Undrained (A)"]
+COLOUR_NUMBERS = [red + (green << 8) + (blue << 16) for red, green, blue in (color.rgb for color in COLORS.values())]
+MAX_UNIT_WEIGHT = 30.0  # [kN / m^3]
+MAX_PERMEABILITY = 1e3  # [m / day]
+# Stiffness ratios of the Hardening Soil model with respect to E50ref
+EOED_E50_RATIO_RANGE = (0.5, 2.0)
+EUR_E50_RATIO_RANGE = (2.0, 10.0)
+MAX_REPORTED_ERRORS = 50
+# Checks of the material properties: the columns of the library that are checked, a predicate on these columns that is
+# True for the materials with an error, and the message. Comparisons with NaN are False, so negated range checks also
+# report missing values
+MATERIAL_CHECKS = [
+    (
+        ("general.SoilModel",),
+        lambda soil_model: ~np.isin(soil_model, SOIL_MODELS),
+        f"the material model should be one of {', '.join(SOIL_MODELS)}",
+    ),
+    (
+        ("general.DrainageType",),
+        lambda drainage_type: ~np.isin(drainage_type, DRAINAGE_TYPES),
+        f"the drainage type should be one of {', '.join(DRAINAGE_TYPES)}",
+    ),
+    (("general.Colour",), lambda colour: ~np.isin(colour, COLOUR_NUMBERS), "the colour is not available"),
+    (
+        ("general.gammaUnsat",),
+        lambda gamma_unsat: ~((gamma_unsat > 0) & (gamma_unsat <= MAX_UNIT_WEIGHT)),
+        f"γ_unsat should be in (0, {MAX_UNIT_WEIGHT}]",
+    ),
+    (
+        ("general.gammaSat",),
+        lambda gamma_sat: ~((gamma_sat > 0) & (gamma_sat <= MAX_UNIT_WEIGHT)),
+        f"γ_sat should be in (0, {MAX_UNIT_WEIGHT}]",
+    ),
+    (
+        ("general.gammaUnsat", "general.gammaSat"),
+        lambda gamma_unsat, gamma_sat: gamma_unsat > gamma_sat,
+        "γ_unsat should not be larger than γ_sat",
+    ),
+    (
+        ("general.SoilModel", "param.E50ref", "param.EoedRef", "param.EurRef"),
+        lambda soil_model, e50_ref, eoed_ref, eur_ref: (soil_model == "Hardening Soil")
+        & ~((e50_ref > 0) & (eoed_ref > 0) & (eur_ref > 0)),
+        "E50ref, EoedRef and EurRef should be > 0",
+    ),
+    (
+        ("general.SoilModel", "param.E50ref", "param.EoedRef"),
+        lambda soil_model, e50_ref, eoed_ref: (soil_model == "Hardening Soil")
+        & ~((eoed_ref >= EOED_E50_RATIO_RANGE[0] * e50_ref) & (eoed_ref <= EOED_E50_RATIO_RANGE[1] * e50_ref)),
+        f"EoedRef / E50ref should be in [{EOED_E50_RATIO_RANGE[0]}, {EOED_E50_RATIO_RANGE[1]}]",
+    ),
+    (
+        ("general.SoilModel", "param.E50ref", "param.EurRef"),
+        lambda soil_model, e50_ref, eur_ref: (soil_model == "Hardening Soil")
+        & ~((eur_ref >= EUR_E50_RATIO_RANGE[0] * e50_ref) & (eur_ref <= EUR_E50_RATIO_RANGE[1] * e50_ref)),
+        f"EurRef / E50ref should be in [{EUR_E50_RATIO_RANGE[0]}, {EUR_E50_RATIO_RANGE[1]}]",
+    ),
+    (
+        ("general.SoilModel", "param.lambdaModified", "param.kappaModified"),
+        lambda soil_model, lambda_modified, kappa_modified: (soil_model == "Soft Soil")
+        & ~((kappa_modified > 0) & (lambda_modified > 0)),
+        "λ* and κ* should be > 0",
+    ),
+    (
+        ("general.SoilModel", "param.lambdaModified", "param.kappaModified"),
+        lambda soil_model, lambda_modified, kappa_modified: (soil_model == "Soft Soil")
+        & ~(kappa_modified < lambda_modified),
+        "κ* should be smaller than λ*",
+    ),
+    (
+        ("groundwater.perm_primary_horizontal_axis", "groundwater.perm_vertical_axis"),
+        lambda horizontal, vertical: ~(
+            (horizontal >= 0) & (horizontal <= MAX_PERMEABILITY) & (vertical >= 0) & (vertical <= MAX_PERMEABILITY)
+        ),
+        f"the permeabilities should be in [0, {MAX_PERMEABILITY}] m/day",
+    ),
+]
+
+
+def flatten_material(params: dict) -> Dict[str, object]:
+    """Flatten the params of a material to a dict with keys "tab.field\" """
+    return {f"{tab}.{field}": value for tab, fields in params.items() for field, value in fields.items()}
+
+
+def unflatten_material(flat_params: Dict[str, object]) -> dict:
+    """Convert a dict with keys "tab.field" to the params of a material"""
+    params = {}
+    for key, value in flat_params.items():
+        tab, field = key.split(".", 1)
+        params.setdefault(tab, {})[field] = value
+    return params
+
+
+def _parse_csv_value(key: str, value: Optional[str]) -> object:
+    if value is None or value.strip() == "":  # Cells missing at the end of a row are None
+        return None
+    if key in TEXT_FIELDS:
+        return value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        return value.strip()  # Reported by the validation
+    return int(number) if key == "general.Colour" and number.is_integer() else number
+
+
+def _get_invalid_rows_message(rows: List[int], problem: str) -> str:
+    row_numbers = ", ".join(str(row + 1) for row in rows[:MAX_REPORTED_ERRORS])
+    if len(rows) > MAX_REPORTED_ERRORS:
+        row_numbers += ", ..."
+    return f"Row{'s' if len(rows) > 1 else ''} {row_numbers}: {problem}"
+
+
+def _read_json_library(content: bytes) -> List[dict]:
+    try:
+        materials = json.loads(content.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as error:
+        raise UserError(f"The material library is not a valid UTF-8 encoded JSON file: {error}") from error
+    if not isinstance(materials, list):
+        raise UserError("A JSON material library should contain a list of materials")
+    invalid_rows = [
+        row
+        for row, material in enumerate(materials)
+        if not isinstance(material, dict) or not all(isinstance(fields, dict) for fields in material.values())
+    ]
+    if invalid_rows:
+        raise UserError(
+            _get_invalid_rows_message(invalid_rows, "a material should be an object of tabs with an object of fields")
+        )
+    return materials
+
+
+def _read_csv_library(content: bytes) -> List[dict]:
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError as error:
+        raise UserError(f"The material library is not a UTF-8 encoded CSV file: {error}") from error
+    reader = csv.DictReader(io.StringIO(text))
+    invalid_columns = [key for key in reader.fieldnames or [] if not all(key.partition(".")[::2])]
+    if invalid_columns:
+        raise UserError(
+            f"The columns should be named 'tab.field', like the columns of an exported library: "
+            f"{', '.join(repr(key) for key in invalid_columns)}"
+        )
+    rows = list(reader)
+    # The cells beyond the last column are stored under the key None
+    invalid_rows = [row for row, cells in enumerate(rows) if None in cells]
+    if invalid_rows:
+        raise UserError(_get_invalid_rows_message(invalid_rows, "the row has more cells than there are columns"))
+    return [unflatten_material({key: _parse_csv_value(key, value) for key, value in row.items()}) for row in rows]
+
+
+def read_library(file_name: str, content: bytes) -> List[dict]:
+    """Read a material library from a CSV file (one material per row, columns "tab.field") or a JSON file (a list of
+    material params, like the material files in the manifest). Rows are numbered by material, like in the validation"""
+    if file_name.lower().endswith(".json"):
+        return _read_json_library(content)
+    if file_name.lower().endswith(".csv"):
+        return _read_csv_library(content)
+    raise UserError("A material library should be a CSV or JSON file")
+
+
+def _get_numbers(flat_materials: List[Dict[str, object]], key: str) -> np.ndarray:
+    """Numeric column of the materials, with NaN for missing and non-numeric values"""
+    return np.array(
+        [
+            value if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+            for value in (material.get(key) for material in flat_materials)
+        ],
+        dtype=float,
+    )
+
+
+def _get_texts(flat_materials: List[Dict[str, object]], key: str) -> np.ndarray:
+    return np.array([str(material.get(key) or "") for material in flat_materials], dtype=object)
+
+
+def validate_materials(materials: List[dict], existing_names: Sequence[str] = ()) -> List[str]:
+    """Validate all materials of a library at once, and return a message for every error that is found"""
+    flat_materials = [flatten_material(material) for material in materials]
+    columns = {
+        key: _get_texts(flat_materials, key) if key in TEXT_FIELDS else _get_numbers(flat_materials, key)
+        for key in {key for keys, _, _ in MATERIAL_CHECKS for key in keys}
+    }
+    names = _get_texts(flat_materials, "general.MaterialName")
+    _, name_index, name_counts = np.unique(names, return_inverse=True, return_counts=True)
+    checks = [
+        (names == "", "the name is missing"),
+        ((name_counts[name_index] > 1) & (names != ""), "the name occurs multiple times in the library"),
+        (np.isin(names, list(existing_names)), "a material with this name already exists"),
+    ] + [(is_error(*(columns[key] for key in keys)), message) for keys, is_error, message in MATERIAL_CHECKS]
+    errors = []
+    for row, message in sorted(
+        ((row, message) for is_error, message in checks for row in np.flatnonzero(is_error)), key=lambda error: error[0]
+    ):
+        errors.append(f"Row {row + 1} ({names[row] or 'unnamed'}): {message}")
+    return errors
+
+
+def get_library_csv(materials: List[dict]) -> str:
+    """Write materials to a CSV material library"""
+    flat_materials = [flatten_material(material) for material in materials]
+    keys = sorted(
+        {key for material in flat_materials for key in material}, key=lambda key: (key != "general.MaterialName", key)
+    )
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=keys, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(flat_materials)
+    return output.getvalue()
+
+
+def get_library_json(materials: List[dict]) -> str:
+    """Write materials to a JSON material library"""
+    return json.dumps(materials, indent=2)
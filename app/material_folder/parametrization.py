@@ -0,0 +1,45 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from viktor.parametrization import ActionButton
+from viktor.parametrization import DownloadButton
+from viktor.parametrization import FileField
+from viktor.parametrization import LineBreak
+from viktor.parametrization import OptionField
+from viktor.parametrization import Parametrization
+from viktor.parametrization import Section
+from viktor.parametrization import Tab
+
+
+class MaterialFolderParametrization(Parametrization):
+    """
+    Define the parametrization of the material folder, used to import and export material libraries
+    """
+
+    library = Tab("Library")
+    library.import_section = Section("Import")
+    library.import_section.file = FileField(
+        "Material library",
+        file_types=[".csv", ".json"],
+        description="CSV file with a column per material field (e.g. general.gammaSat), or a JSON list of materials",
+    )
+    library.import_section.new_line = LineBreak()
+    library.import_section.import_button = ActionButton("Import materials", method="import_materials")
+    library.export_section = Section("Export")
+    library.export_section.file_format = OptionField("File format", options=["CSV", "JSON"], default="CSV")
+    library.export_section.new_line = LineBreak()
+    library.export_section.export_button = DownloadButton("Export materials", method="export_materials")
@@ -0,0 +1,74 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import math
+from typing import Any
+from typing import Iterator
+from typing import Tuple
+
+# Number of items when iterating over a collection of the fake PLAXIS model, e.g. g_o.Phases
+COLLECTION_SIZES = {"Phases": 5, "Steps": 50, "Soils": 100, "CurvePoints": 1}
+
+
+class RPCCounter:
+    """Counts the commands that are sent to the fake scripting server"""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0  # Reached time of the last step that was read
+
+
+class FakeProxy:
+    """Stand-in for a PLAXIS scripting proxy object.
+
+    Every call of a command and every property assignment counts as one remote procedure call, as these are sent to
+    the scripting server one by one. Reading properties is not counted. Curve results and reached times are returned
+    as numbers, such that the worker can write its output.
+    """
+
+    def __init__(self, counter: RPCCounter, name: str = "g"):
+        object.__setattr__(self, "_counter", counter)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "value":
+            self._counter.time += 1.0
+            return self._counter.time
+        return FakeProxy(self._counter, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        self._counter.count += 1
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        self._counter.count += 1
+        if self._name == "getcurveresults":
+            return -10.0 * math.exp(-self._counter.time / 100.0)
+        return FakeProxy(self._counter, self._name)
+
+    def __getitem__(self, item: Any) -> "FakeProxy":
+        return FakeProxy(self._counter, self._name)
+
+    def __iter__(self) -> Iterator["FakeProxy"]:
+        return iter([FakeProxy(self._counter, self._name) for _ in range(COLLECTION_SIZES.get(self._name, 0))])
+
+
+def new_server(
+    address: str, port: int, password: str = None, counter: RPCCounter = None
+) -> Tuple[FakeProxy, FakeProxy]:
+    """Fake version of plxscripting.easy.new_server, returning the server and global proxies"""
+    counter = counter or RPCCounter()
+    return FakeProxy(counter, "s"), FakeProxy(counter, "g")
@@ -0,0 +1,76 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+from copy import deepcopy
+from itertools import cycle
+from pathlib import Path
+from typing import Dict
+
+from munch import Munch
+from munch import munchify
+
+MANIFEST_PATH = Path(__file__).parents[1] / "manifest"
+# Materials of the soil layers of the sample embankment, from top to bottom
+SOIL_MATERIALS = ["peat", "clay", "sand"]
+# Stand-in entity ids of the materials in the manifest
+MATERIAL_IDS = {"embankment": 1, "peat": 2, "clay": 3, "sand": 4}
+
+
+def get_material(name: str) -> Munch:
+    """Mimic the value of an EntityOptionField that refers to a material entity in the manifest"""
+    with open(MANIFEST_PATH / "Material" / f"{name}.json", "r", encoding="utf-8") as f:
+        return Munch(id=MATERIAL_IDS[name], name=name, last_saved_params=munchify(json.load(f)))
+
+
+def get_sample_params() -> Munch:
+    """Params of the sample embankment, with the materials of the manifest selected"""
+    with open(MANIFEST_PATH / "Embankment" / "sample-embankment.json", "r", encoding="utf-8") as f:
+        params = munchify(json.load(f))
+    params.geometry_tab.embankment.material = get_material("embankment")
+    for layer, material in zip(params.geometry_tab.soil.layers, SOIL_MATERIALS):
+        layer.material = get_material(material)
+    params.geometry_tab.drain.selector = True
+    return params
+
+
+def scale_params(params: Munch, n_layers: int = None, drain_spacing: float = None, soil_width: float = None) -> Munch:
+    """Scale the sample embankment to a larger model"""
+    params_ = deepcopy(params)
+    if n_layers is not None:
+        thickness = sum(layer.thickness for layer in params_.geometry_tab.soil.layers) / n_layers
+        params_.geometry_tab.soil.layers = [
+            Munch(thickness=thickness, material=get_material(material))
+            for _, material in zip(range(n_layers), cycle(SOIL_MATERIALS))
+        ]
+    if drain_spacing is not None:
+        params_.geometry_tab.drain.spacing = drain_spacing
+    if soil_width is not None:
+        params_.geometry_tab.soil.width = soil_width
+    return params_
+
+
+def get_variants() -> Dict[str, Munch]:
+    """The sample embankment and its scaled variants, keyed by name"""
+    sample = get_sample_params()
+    return {
+        "sample": sample,
+        "more_layers": scale_params(sample, n_layers=12),
+        "dense_drains": scale_params(sample, drain_spacing=0.25),
+        "wide_soil": scale_params(sample, soil_width=120.0),
+        "large": scale_params(sample, n_layers=12, drain_spacing=0.25, soil_width=120.0),
+    }
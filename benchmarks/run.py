@@ -0,0 +1,165 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import argparse
+import gc
+import json
+import runpy
+import shutil
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+from functools import partial
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable
+from typing import Dict
+from unittest import mock
+
+from munch import Munch
+
+from app.embankment.analysis import prepare_job
+from app.embankment.visualisation import get_embankment_geometry_group
+from benchmarks import fake_plxscripting
+from benchmarks.fixtures import get_variants
+
+PLAXIS_SCRIPT_PATH = Path(__file__).parents[1] / "app" / "lib" / "plaxis.py"
+BASELINES_PATH = Path(__file__).parent / "baselines.json"
+# Increase with respect to the baseline that is reported as a regression, as a relative and an absolute part. Wall
+# times are noisy, so these are only meant to catch large regressions. The number of RPCs is deterministic and may not
+# increase at all.
+RELATIVE_TOLERANCES = {"wall_time_ms": 1.0, "peak_memory_kib": 0.2, "rpc_calls": 0.0}
+ABSOLUTE_TOLERANCES = {"wall_time_ms": 5.0, "peak_memory_kib": 16.0, "rpc_calls": 0.0}
+
+
+def run_worker_script(json_input: str, json_materials: str, counter: fake_plxscripting.RPCCounter) -> dict:
+    """Run the worker script in a temporary directory against the fake scripting server, return its globals"""
+    fake_easy = types.ModuleType("plxscripting.easy")
+    fake_easy.new_server = partial(fake_plxscripting.new_server, counter=counter)
+    fake_modules = {"plxscripting": types.ModuleType("plxscripting"), "plxscripting.easy": fake_easy}
+    with TemporaryDirectory() as directory:
+        script_path = Path(directory) / "plaxis.py"
+        shutil.copy(PLAXIS_SCRIPT_PATH, script_path)
+        (Path(directory) / "input.json").write_text(json_input, encoding="utf-8")
+        (Path(directory) / "materials.json").write_text(json_materials, encoding="utf-8")
+        # PLAXIS is not started and the script does not wait for it to boot. The artifact cache is kept in the temporary
+        # directory as well
+        with mock.patch.dict(sys.modules, fake_modules), mock.patch("subprocess.Popen"), mock.patch("time.sleep"):
+            with mock.patch("tempfile.gettempdir", return_value=directory):
+                return runpy.run_path(str(script_path), run_name="__main__")
+
+
+def flatten_materials(json_materials: str, worker_globals: dict) -> list:
+    """Flatten the materials and order their properties, as the worker script does before creating them in PLAXIS"""
+    get_deepest_dict = worker_globals["get_deepest_dict"]
+    ordered_material_keys = worker_globals["ORDERED_MATERIAL_KEYS"]
+    materials = []
+    for params_material in json.loads(json_materials):
+        material_flattened_dict = get_deepest_dict(params_material)
+        materials.append(
+            [(key, material_flattened_dict[key]) for key in ordered_material_keys if key in material_flattened_dict]
+        )
+    return materials
+
+
+def measure(function: Callable, repeat: int) -> Dict[str, float]:
+    """Peak memory allocated by the function, and its median wall time over a number of runs. The memory is measured
+    first, after a garbage collection such that it does not depend on the earlier variants. This run also warms up any
+    caches and lazy imports before timing"""
+    gc.collect()
+    tracemalloc.start()
+    function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    wall_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        wall_times.append(time.perf_counter() - start)
+    return {"wall_time_ms": statistics.median(wall_times) * 1000.0, "peak_memory_kib": peak_memory / 1024.0}
+
+
+def benchmark_variant(params: Munch, repeat: int) -> Dict[str, Dict[str, float]]:
+    """Time each stage of an analysis of an embankment variant, from controller preprocessing to the worker script"""
+    job = prepare_job(params)
+    counter = fake_plxscripting.RPCCounter()
+    worker_globals = run_worker_script(job.json_input, job.json_materials, counter)
+    rpc_calls = counter.count
+    return {
+        "preprocessing": measure(lambda: prepare_job(params), repeat),
+        "geometry": measure(lambda: get_embankment_geometry_group(params), repeat),
+        "material_flattening": measure(lambda: flatten_materials(job.json_materials, worker_globals), repeat),
+        "worker_script": {
+            **measure(lambda: run_worker_script(job.json_input, job.json_materials, counter), repeat),
+            "rpc_calls": rpc_calls,
+        },
+    }
+
+
+def get_regressions(results: dict, baselines: dict) -> list:
+    """Compare the results with the stored baselines, return a description of each regression"""
+    regressions = []
+    for variant, stages in results.items():
+        for stage, metrics in stages.items():
+            for metric, value in metrics.items():
+                baseline = baselines.get(variant, {}).get(stage, {}).get(metric)
+                if baseline is None:
+                    continue
+                if value > baseline * (1.0 + RELATIVE_TOLERANCES[metric]) + ABSOLUTE_TOLERANCES[metric]:
+                    regressions.append(f"{variant} / {stage} / {metric}: {value:.1f} (baseline {baseline:.1f})")
+    return regressions
+
+
+def main() -> int:
+    """Run the benchmarks, print the results and compare them with the baselines"""
+    parser = argparse.ArgumentParser(description="Benchmark the stages of a PLAXIS embankment analysis")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed runs per stage")
+    parser.add_argument("--variant", action="append", help="only run this variant, can be given multiple times")
+    parser.add_argument("--update-baselines", action="store_true", help="store the results as the new baselines")
+    args = parser.parse_args()
+
+    variants = get_variants()
+    results = {
+        name: benchmark_variant(params, args.repeat)
+        for name, params in variants.items()
+        if args.variant is None or name in args.variant
+    }
+    print(f"{'variant':<15}{'stage':<22}{'wall time [ms]':>16}{'peak memory [KiB]':>20}{'RPC calls':>12}")
+    for variant, stages in results.items():
+        for stage, metrics in stages.items():
+            rpc_calls = metrics.get("rpc_calls", "")
+            print(
+                f"{variant:<15}{stage:<22}{metrics['wall_time_ms']:>16.2f}{metrics['peak_memory_kib']:>20.1f}"
+                f"{rpc_calls:>12}"
+            )
+
+    baselines = json.loads(BASELINES_PATH.read_text(encoding="utf-8")) if BASELINES_PATH.exists() else {}
+    if args.update_baselines:
+        baselines.update(results)
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Baselines stored in {BASELINES_PATH}")
+        return 0
+    regressions = get_regressions(results, baselines)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
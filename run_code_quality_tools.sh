@@ -4,11 +4,11 @@ echo -e "Activate virtual environment\n"
 source ./venv/bin/activate
 
 echo -e "Running black\n"
-python -m black app/ tests/
+python -m black app/ benchmarks/ tests/
 echo -e "Running isort\n"
-python -m isort app/ tests/
+python -m isort app/ benchmarks/ tests/
 echo -e "Running pylint\n"
-python -m pylint app/ tests/
+python -m pylint app/ benchmarks/ tests/
 echo -e "Running tests\n"
 viktor-cli test
 
@@ -0,0 +1,104 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+import unittest
+from pathlib import Path
+
+import numpy as np
+from munch import munchify
+
+from app.embankment.domain import MAX_SOIL_WIDTH
+from app.embankment.domain import MIN_FOOTPRINT_FACTOR
+from app.embankment.domain import WIDTH_STEP
+from app.embankment.domain import get_drain_errors
+from app.embankment.domain import get_minimum_soil_width
+from app.embankment.domain import get_strip_load_stress
+
+SAMPLE_EMBANKMENT = Path(__file__).parent.parent / "manifest" / "Embankment" / "sample-embankment.json"
+
+
+def get_geometry():
+    """Geometry tab of the sample embankment"""
+    return munchify(json.loads(SAMPLE_EMBANKMENT.read_text())["geometry_tab"])
+
+
+class TestMinimumSoilWidth(unittest.TestCase):
+    """Automatic soil semi-width of the sample embankment"""
+
+    def test_boundary_stress(self):
+        """The width is the smallest width step at which the boundary stress is below the tolerance"""
+        geometry = get_geometry()
+        width = get_minimum_soil_width(geometry, 0.0005)
+        half_width = geometry.embankment.width / 2.0 + geometry.embankment.slope_width / 2.0
+        reference_stress = get_strip_load_stress(0.0, geometry.soil.layers[0].thickness, half_width)
+        depths = np.linspace(0.1, sum(layer.thickness for layer in geometry.soil.layers), 50)
+        self.assertLessEqual(get_strip_load_stress(width, depths, half_width).max(), 0.0005 * reference_stress)
+        self.assertGreater(
+            get_strip_load_stress(width - WIDTH_STEP, depths, half_width).max(), 0.0005 * reference_stress
+        )
+        self.assertEqual(width % WIDTH_STEP, 0.0)
+
+    def test_tolerance(self):
+        """A smaller tolerance gives a wider model"""
+        geometry = get_geometry()
+        self.assertLess(get_minimum_soil_width(geometry, 0.001), get_minimum_soil_width(geometry, 0.0005))
+
+    def test_footprint(self):
+        """The width is at least the minimum factor times the footprint of the embankment"""
+        geometry = get_geometry()
+        footprint = geometry.embankment.width + 2.0 * geometry.embankment.slope_width
+        self.assertEqual(get_minimum_soil_width(geometry, 0.01), MIN_FOOTPRINT_FACTOR * footprint)
+
+    def test_maximum_width(self):
+        """The width is limited to the maximum soil width"""
+        self.assertEqual(get_minimum_soil_width(get_geometry(), 1e-6), MAX_SOIL_WIDTH)
+
+
+class TestDrainErrors(unittest.TestCase):
+    """Drain settings that the worker cannot create"""
+
+    def test_valid(self):
+        """The drains of the sample embankment are valid, and the settings of disabled drains are not checked"""
+        geometry = get_geometry()
+        geometry.drain.update(selector=True, spacing=2.0, depth=len(geometry.soil.layers))
+        self.assertEqual(get_drain_errors(geometry), [])
+        geometry.drain.update(selector=False, spacing=0.0)
+        self.assertEqual(get_drain_errors(geometry), [])
+
+    def test_spacing(self):
+        """A missing or non-positive spacing is reported"""
+        geometry = get_geometry()
+        for spacing in (None, 0.0, -1.0):
+            with self.subTest(spacing=spacing):
+                geometry.drain.update(selector=True, spacing=spacing, depth=1)
+                self.assertEqual(get_drain_errors(geometry), ["The drain spacing should be larger than 0"])
+
+    def test_depth(self):
+        """The drains have to end in one of the soil layers"""
+        geometry = get_geometry()
+        n_layers = len(geometry.soil.layers)
+        for depth in (None, 0, n_layers + 1):
+            with self.subTest(depth=depth):
+                geometry.drain.update(selector=True, spacing=2.0, depth=depth)
+                self.assertEqual(
+                    get_drain_errors(geometry), [f"The drains should end in one of the {n_layers} soil layers"]
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
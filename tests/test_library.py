@@ -0,0 +1,118 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import copy
+import json
+import unittest
+from pathlib import Path
+
+from viktor import UserError
+
+from app.material_folder.library import get_library_csv
+from app.material_folder.library import get_library_json
+from app.material_folder.library import read_library
+from app.material_folder.library import validate_materials
+
+MATERIAL_DIR = Path(__file__).parent.parent / "manifest" / "Material"
+
+
+def get_materials() -> list:
+    """Materials of the manifest: clay, embankment, peat and sand"""
+    return [json.loads(path.read_text()) for path in sorted(MATERIAL_DIR.glob("*.json"))]
+
+
+class TestReadLibrary(unittest.TestCase):
+    """Reading of CSV and JSON material libraries"""
+
+    def test_round_trip(self):
+        """An exported library is read as the exported materials"""
+        materials = get_materials()
+        self.assertEqual(read_library("materials.csv", get_library_csv(materials).encode()), materials)
+        self.assertEqual(read_library("materials.json", get_library_json(materials).encode()), materials)
+
+    def test_missing_cells(self):
+        """Missing cells at the end of a row are empty values"""
+        materials = read_library("materials.csv", b"general.MaterialName,general.gammaSat\nClay\n")
+        self.assertEqual(materials, [{"general": {"MaterialName": "Clay", "gammaSat": None}}])
+
+    def test_invalid_files(self):
+        """Invalid files are reported to the user"""
+        invalid_files = [
+            ("materials.txt", b""),
+            ("materials.json", b"{"),
+            ("materials.json", '[{"general": {"MaterialName": "Clay"}}]'.encode("utf-16")),
+            ("materials.json", b'{"general": {}}'),
+            ("materials.json", b'[{"general": {}}, 1, {"general": 2}]'),
+            ("materials.csv", b"MaterialName,general.gammaSat\nClay,15\n"),
+            ("materials.csv", b"general.MaterialName,general.gammaSat\nClay,15,16\n"),
+            ("materials.csv", b"general.MaterialName\n\xff\n"),
+        ]
+        for file_name, content in invalid_files:
+            with self.subTest(file_name=file_name, content=content), self.assertRaises(UserError):
+                read_library(file_name, content)
+
+
+class TestValidateMaterials(unittest.TestCase):
+    """Validation of a material library"""
+
+    def test_valid_library(self):
+        """The materials of the manifest are valid"""
+        self.assertEqual(validate_materials(get_materials()), [])
+
+    def test_existing_name(self):
+        """Materials with the name of an existing material are reported"""
+        self.assertEqual(
+            validate_materials(get_materials(), existing_names=["Peat"]),
+            ["Row 3 (Peat): a material with this name already exists"],
+        )
+
+    def test_duplicate_name(self):
+        """All rows of a name that occurs multiple times are reported"""
+        materials = get_materials()
+        materials.append(copy.deepcopy(materials[0]))
+        self.assertEqual(
+            validate_materials(materials),
+            [
+                "Row 1 (Clay): the name occurs multiple times in the library",
+                "Row 5 (Clay): the name occurs multiple times in the library",
+            ],
+        )
+
+    def test_invalid_values(self):
+        """Each invalid value is reported on its row"""
+        materials = get_materials()
+        materials[0]["param"]["kappaModified"] = 0.1
+        materials[1]["general"]["gammaUnsat"] = None
+        materials[3]["general"]["SoilModel"] = "Mohr-Coulomb"
+        self.assertEqual(
+            validate_materials(materials),
+            [
+                "Row 1 (Clay): κ* should be smaller than λ*",
+                "Row 2 (Embankment): γ_unsat should be in (0, 30.0]",
+                "Row 4 (Sand): the material model should be one of Hardening Soil, Soft Soil",
+            ],
+        )
+
+    def test_missing_name(self):
+        """A material without name is reported as unnamed"""
+        materials = get_materials()
+        del materials[2]["general"]["MaterialName"]
+        self.assertEqual(validate_materials(materials), ["Row 3 (unnamed): the name is missing"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import unittest
+
+import numpy as np
+
+from app.embankment.metrics import get_consolidation_metrics
+from app.embankment.metrics import get_degree_of_consolidation
+
+
+def get_output(consolidation_time: float = 5.0) -> dict:
+    """Linear construction to 20 kPa in 2 days, followed by exponential consolidation"""
+    construction_time = np.linspace(0.0, 2.0, 11)
+    consolidation = 2.0 + np.linspace(0.1, 40.0, 200)
+    return {
+        "time": [*construction_time, *consolidation],
+        "p_excess": [*(-10.0 * construction_time), *(-20.0 * np.exp(-(consolidation - 2.0) / consolidation_time))],
+        "phase": [1] * len(construction_time) + [2] * len(consolidation),
+    }
+
+
+class TestMetrics(unittest.TestCase):
+    """Consolidation metrics of a construction phase followed by a consolidation phase"""
+
+    def test_degree_of_consolidation(self):
+        """U(t) is measured from the excess pore pressure at the start of the phase"""
+        output = get_output()
+        degree = get_degree_of_consolidation(np.array([output["p_excess"]]), np.array(output["phase"]))[0]
+        self.assertEqual(degree.shape, (len(output["time"]),))
+        self.assertTrue(np.all(degree[:11] == 0.0))  # The peak of the construction phase is at its end
+        expected = 1.0 - np.exp(-(np.array(output["time"][11:]) - 2.0) / 5.0)
+        np.testing.assert_allclose(degree[11:], expected)
+
+    def test_phase_metrics(self):
+        """t50 and t90 follow from the exponential decay of the consolidation phase"""
+        phases = get_consolidation_metrics(get_output())["phases"]
+        construction, consolidation = phases[0], phases[1]
+        self.assertEqual(construction["phase"], 1)
+        self.assertEqual(construction["start_time"], 0.0)
+        self.assertIsNone(construction["t50"])
+        self.assertEqual(consolidation["start_time"], 2.0)
+        self.assertAlmostEqual(consolidation["peak_p_excess"], 20.0)
+        self.assertAlmostEqual(consolidation["t50"], 5.0 * np.log(2.0), delta=0.05)
+        self.assertAlmostEqual(consolidation["t90"], 5.0 * np.log(10.0), delta=0.05)
+
+    def test_slower_consolidation(self):
+        """Slower consolidation takes longer to reach 90%"""
+        fast = get_consolidation_metrics(get_output(consolidation_time=2.0))["phases"][1]
+        slow = get_consolidation_metrics(get_output(consolidation_time=8.0))["phases"][1]
+        self.assertLess(fast["t90"], slow["t90"])
+
+    def test_unreached_degree(self):
+        """t90 is empty when 90% consolidation is not reached within the phase"""
+        consolidation = get_consolidation_metrics(get_output(consolidation_time=100.0))["phases"][1]
+        self.assertIsNone(consolidation["t90"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import unittest
+
+import numpy as np
+
+from app.embankment.plotting import decimate_curve
+from app.embankment.plotting import lttb
+
+
+class TestLttb(unittest.TestCase):
+    """Largest-Triangle-Three-Buckets decimation"""
+
+    def test_short_curve(self):
+        """A curve with fewer points than requested is kept as is"""
+        points = np.arange(10.0)
+        np.testing.assert_array_equal(lttb(points, points, 20), np.arange(10))
+
+    def test_selection(self):
+        """The first and last point are kept, in order"""
+        time = np.linspace(0.0, 10.0, 1000)
+        selected = lttb(time, np.sin(time), 50)
+        self.assertEqual(len(selected), 50)
+        self.assertEqual(selected[0], 0)
+        self.assertEqual(selected[-1], 999)
+        self.assertTrue(np.all(np.diff(selected) > 0))
+
+    def test_peak_is_kept(self):
+        """A single peak spans the largest triangle of its bucket"""
+        values = np.zeros(1000)
+        values[437] = 1.0
+        self.assertIn(437, lttb(np.arange(1000.0), values, 20))
+
+
+class TestDecimateCurve(unittest.TestCase):
+    """Decimation of a P_excess-vs-time curve on a logarithmic time axis"""
+
+    def test_decimate_curve(self):
+        """The decimated curve consists of points of the original curve"""
+        time = np.concatenate(([0.0], np.logspace(-3, 3, 5000)))
+        p_excess = -np.exp(-time)
+        decimated_time, decimated_p_excess = decimate_curve(time.tolist(), p_excess.tolist(), 100)
+        self.assertEqual(len(decimated_time), 100)
+        self.assertEqual(decimated_time[0], 0.0)
+        self.assertEqual(decimated_time[-1], time[-1])
+        np.testing.assert_array_equal(decimated_p_excess, -np.exp(-decimated_time))
+
+    def test_initial_phase_only(self):
+        """A curve without positive times is not decimated"""
+        time, p_excess = decimate_curve([0.0, 0.0], [0.0, 0.0], 100)
+        np.testing.assert_array_equal(time, [0.0, 0.0])
+        np.testing.assert_array_equal(p_excess, [0.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import unittest
+
+import numpy as np
+
+from app.embankment.runtime import DEFAULT_RUNTIME
+from app.embankment.runtime import MAX_TIMEOUT
+from app.embankment.runtime import MIN_TIMEOUT
+from app.embankment.runtime import get_timeout
+from app.embankment.runtime import predict_runtime
+
+COEFFICIENTS = np.array([20.0, 30.0, 5.0, 1.0, 4.0, 40.0])
+
+
+def get_records(n_records: int, seed: int = 0) -> list:
+    """Runs of which the duration is a linear function of the features"""
+    rng = np.random.default_rng(seed)
+    features = np.column_stack(
+        [
+            np.ones(n_records),
+            rng.integers(1, 6, n_records),
+            rng.integers(0, 20, n_records),
+            rng.uniform(30.0, 120.0, n_records),
+            rng.uniform(5.0, 20.0, n_records),
+            rng.integers(1, 5, n_records),
+        ]
+    )
+    return [{"features": row.tolist(), "duration": float(row @ COEFFICIENTS)} for row in features]
+
+
+class TestPredictRuntime(unittest.TestCase):
+    """Run time prediction from earlier runs"""
+
+    def test_too_few_records(self):
+        """The default run time is returned as long as too few runs are recorded"""
+        self.assertEqual(predict_runtime([1.0, 3, 4, 60.0, 9.0, 4], get_records(6)), (DEFAULT_RUNTIME, DEFAULT_RUNTIME))
+
+    def test_prediction(self):
+        """A linear relation between the features and run time is recovered"""
+        features = [1.0, 3, 4, 60.0, 9.0, 4]
+        prediction, std = predict_runtime(features, get_records(50))
+        self.assertAlmostEqual(prediction, float(np.array(features) @ COEFFICIENTS), delta=1.0)
+        self.assertLess(std, 1.0)
+
+    def test_other_features_are_ignored(self):
+        """Runs recorded with other features are ignored"""
+        records = get_records(50) + [{"features": [1.0, 3, 4, 60.0, 9.0], "duration": 1e5}]
+        prediction, _ = predict_runtime([1.0, 3, 4, 60.0, 9.0, 4], records)
+        self.assertLess(prediction, 1e3)
+
+    def test_censored_records(self):
+        """Runs killed at their timeout do not bias the prediction towards their timeout"""
+        records = get_records(50)
+        features = [1.0, 3, 4, 60.0, 9.0, 4]
+        uncensored_prediction, _ = predict_runtime(features, records)
+        for record in records[:10]:
+            record["duration"] /= 2.0
+            record["censored"] = True
+        prediction, _ = predict_runtime(features, records)
+        self.assertAlmostEqual(prediction, uncensored_prediction, delta=0.05 * uncensored_prediction)
+        naive_prediction, _ = predict_runtime(features, [dict(record, censored=False) for record in records])
+        self.assertLess(abs(prediction - uncensored_prediction), abs(naive_prediction - uncensored_prediction))
+
+    def test_all_censored(self):
+        """Without finished runs, the standard deviation is the default run time"""
+        records = [dict(record, censored=True) for record in get_records(50)]
+        _, std = predict_runtime([1.0, 3, 4, 60.0, 9.0, 4], records)
+        self.assertEqual(std, DEFAULT_RUNTIME)
+
+
+class TestTimeout(unittest.TestCase):
+    """Timeout of an analysis"""
+
+    def test_timeout(self):
+        """The timeout is within its limits and leaves a margin on the prediction"""
+        self.assertEqual(get_timeout(1.0, 0.0), MIN_TIMEOUT)
+        self.assertEqual(get_timeout(1e5, 0.0), MAX_TIMEOUT)
+        self.assertGreater(get_timeout(300.0, 10.0), 300.0 + 3 * 10.0)
+
+    def test_timed_out(self):
+        """The timeout is raised for an analysis that was killed before"""
+        self.assertGreaterEqual(get_timeout(100.0, 10.0, timed_out_duration=400.0), 800)
+
+
+if __name__ == "__main__":
+    unittest.main()
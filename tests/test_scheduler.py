@@ -0,0 +1,141 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import unittest
+
+from app.embankment.scheduler import AGING_INTERVAL
+from app.embankment.scheduler import Priority
+from app.embankment.scheduler import get_admission_order
+from app.embankment.scheduler import supersede_tickets
+from app.embankment.scheduler import take_over_tickets
+
+
+def get_ticket(
+    ticket_id: str, user: str, priority: Priority, submitted: float, state: str = "queued", **kwargs
+) -> dict:
+    """Ticket of the worker queue, with the id as input hash"""
+    ticket = {
+        "id": ticket_id,
+        "user": user,
+        "entity_id": None,
+        "input_hash": ticket_id,
+        "priority": int(priority),
+        "state": state,
+        "submitted": submitted,
+        "heartbeat": submitted,
+    }
+    ticket.update(kwargs)
+    return ticket
+
+
+def get_ids(tickets: list) -> list:
+    """Ids of the tickets, in order"""
+    return [ticket["id"] for ticket in tickets]
+
+
+class TestAdmissionOrder(unittest.TestCase):
+    """Order in which waiting tickets are admitted to the worker"""
+
+    def test_priority_classes(self):
+        """Tickets are admitted by priority class"""
+        tickets = [
+            get_ticket("batch", "a", Priority.BATCH, 0.0),
+            get_ticket("analysis", "a", Priority.ANALYSIS, 10.0),
+            get_ticket("interactive", "a", Priority.INTERACTIVE, 20.0),
+        ]
+        self.assertEqual(get_ids(get_admission_order(tickets, now=30.0)), ["interactive", "analysis", "batch"])
+
+    def test_fair_share(self):
+        """Within a class, the users take turns"""
+        tickets = [
+            get_ticket("a1", "a", Priority.BATCH, 0.0),
+            get_ticket("a2", "a", Priority.BATCH, 1.0),
+            get_ticket("a3", "a", Priority.BATCH, 2.0),
+            get_ticket("b1", "b", Priority.BATCH, 3.0),
+            get_ticket("b2", "b", Priority.BATCH, 4.0),
+        ]
+        self.assertEqual(get_ids(get_admission_order(tickets, now=5.0)), ["a1", "b1", "a2", "b2", "a3"])
+
+    def test_running_tickets_count_for_the_share(self):
+        """Running tickets count for the share of a user, cancelled tickets are skipped"""
+        tickets = [
+            get_ticket("a0", "a", Priority.BATCH, 0.0, state="running"),
+            get_ticket("a1", "a", Priority.BATCH, 1.0),
+            get_ticket("b1", "b", Priority.BATCH, 2.0),
+            get_ticket("c1", "c", Priority.BATCH, 3.0, state="cancelled"),
+        ]
+        self.assertEqual(get_ids(get_admission_order(tickets, now=5.0)), ["b1", "a1"])
+
+    def test_aging(self):
+        """A waiting ticket moves up one class per aging interval"""
+        now = 2 * AGING_INTERVAL
+        tickets = [
+            get_ticket("old", "a", Priority.BATCH, 0.0),
+            get_ticket("new", "b", Priority.ANALYSIS, now),
+        ]
+        self.assertEqual(get_ids(get_admission_order(tickets, now)), ["old", "new"])
+        tickets[0]["submitted"] = now - AGING_INTERVAL / 2
+        self.assertEqual(get_ids(get_admission_order(tickets, now)), ["new", "old"])
+
+
+class TestSupersedeTickets(unittest.TestCase):
+    """Cancellation of waiting tickets of which the input is outdated"""
+
+    def test_supersede(self):
+        """Only waiting tickets of the same entity with another input are cancelled"""
+        tickets = [
+            get_ticket("old", "a", Priority.ANALYSIS, 0.0, entity_id=1),
+            get_ticket("same", "a", Priority.ANALYSIS, 0.0, entity_id=1, input_hash="new"),
+            get_ticket("running", "a", Priority.ANALYSIS, 0.0, entity_id=1, state="running"),
+            get_ticket("other", "a", Priority.ANALYSIS, 0.0, entity_id=2),
+        ]
+        self.assertTrue(supersede_tickets(tickets, 1, "new"))
+        self.assertEqual([ticket["state"] for ticket in tickets], ["cancelled", "queued", "running", "queued"])
+
+    def test_other_priority_class(self):
+        """Tickets in another priority class are superseded as well"""
+        tickets = [get_ticket("batch", "a", Priority.BATCH, 0.0, entity_id=1)]
+        self.assertTrue(supersede_tickets(tickets, 1, "new"))
+        self.assertEqual(tickets[0]["state"], "cancelled")
+
+    def test_without_entity(self):
+        """Analyses without entity do not supersede other analyses"""
+        tickets = [get_ticket("old", "a", Priority.ANALYSIS, 0.0)]
+        self.assertFalse(supersede_tickets(tickets, None, "new"))
+
+
+class TestTakeOverTickets(unittest.TestCase):
+    """Cancellation of waiting tickets of the same input that a view runs at its own priority"""
+
+    def test_take_over(self):
+        """Only waiting tickets of the same entity and input in a lower priority class are cancelled"""
+        tickets = [
+            get_ticket("batch", "a", Priority.BATCH, 0.0, entity_id=1, input_hash="same"),
+            get_ticket("interactive", "a", Priority.INTERACTIVE, 0.0, entity_id=1, input_hash="same"),
+            get_ticket("running", "a", Priority.BATCH, 0.0, entity_id=1, input_hash="same", state="running"),
+            get_ticket("other_input", "a", Priority.BATCH, 0.0, entity_id=1),
+            get_ticket("other_entity", "a", Priority.BATCH, 0.0, entity_id=2, input_hash="same"),
+        ]
+        self.assertTrue(take_over_tickets(tickets, 1, "same", Priority.ANALYSIS))
+        self.assertEqual(
+            [ticket["state"] for ticket in tickets], ["cancelled", "queued", "running", "queued", "queued"]
+        )
+        self.assertFalse(take_over_tickets(tickets, 1, "same", Priority.ANALYSIS))
+
+
+if __name__ == "__main__":
+    unittest.main()
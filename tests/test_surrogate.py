@@ -0,0 +1,123 @@
+"""
+Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+import unittest
+from pathlib import Path
+
+import numpy as np
+from viktor import UserError
+
+from app.embankment.surrogate import FEATURE_NAMES
+from app.embankment.surrogate import MIN_DATASET_RECORDS
+from app.embankment.surrogate import TIME_GRID
+from app.embankment.surrogate import SurrogateModel
+from app.embankment.surrogate import get_surrogate_features
+from app.embankment.surrogate import resample_curve
+
+MANIFEST_DIR = Path(__file__).parent.parent / "manifest"
+
+
+def get_curve(features: np.ndarray) -> np.ndarray:
+    """Consolidation curve of which the peak depends on the first feature and the time scale on the second"""
+    return -10.0 * features[0] * np.exp(-TIME_GRID / (10.0 * features[1]))
+
+
+def get_records(n_records: int, seed: int = 0) -> list:
+    """Records of which the features are drawn uniformly between 1 and 2"""
+    rng = np.random.default_rng(seed)
+    features = rng.uniform(1.0, 2.0, (n_records, len(FEATURE_NAMES)))
+    return [{"features": row.tolist(), "p_excess": get_curve(row).tolist()} for row in features]
+
+
+def get_worker_input(staging: dict, calculation: dict) -> tuple:
+    """Worker input of the sample embankment, with the manifest materials"""
+    worker_input = json.loads((MANIFEST_DIR / "Embankment" / "sample-embankment.json").read_text())
+    worker_input["staging_tab"].update(staging)
+    if calculation:
+        worker_input["calculation_tab"] = calculation
+    materials = [
+        json.loads((MANIFEST_DIR / "Material" / f"{name}.json").read_text())
+        for name in ["embankment", "peat", "clay", "sand"]
+    ]
+    return json.dumps(worker_input), json.dumps(materials)
+
+
+class TestSurrogateFeatures(unittest.TestCase):
+    """Features of an analysis"""
+
+    def test_staging(self):
+        """Analyses with a different staging or step limit have different features"""
+        features = get_surrogate_features(*get_worker_input({}, {}))
+        self.assertEqual(len(features), len(FEATURE_NAMES))
+        staged = get_surrogate_features(
+            *get_worker_input(
+                {"first_consolidation": {"loading_type": "Staged construction", "time_interval": 20.0}}, {}
+            )
+        )
+        limited = get_surrogate_features(*get_worker_input({}, {"end_of_consolidation": {"max_steps": 100}}))
+        self.assertEqual(
+            [name for name, value, staged_value in zip(FEATURE_NAMES, features, staged) if value != staged_value],
+            ["First consolidation staged", "First consolidation time"],
+        )
+        self.assertEqual(
+            [name for name, value, limited_value in zip(FEATURE_NAMES, features, limited) if value != limited_value],
+            ["End of consolidation max steps"],
+        )
+
+
+class TestSurrogateModel(unittest.TestCase):
+    """Surrogate model of the P_excess curve"""
+
+    def test_too_few_records(self):
+        """The model needs a minimum number of analyses"""
+        with self.assertRaises(UserError):
+            SurrogateModel(get_records(MIN_DATASET_RECORDS - 1))
+
+    def test_training_record(self):
+        """The model reproduces the analyses that it was trained on"""
+        records = get_records(40)
+        prediction = SurrogateModel(records).predict(records[0]["features"])
+        np.testing.assert_allclose(prediction.p_excess, records[0]["p_excess"], atol=0.1)
+        self.assertTrue(prediction.in_envelope)
+        self.assertEqual(prediction.outside_features, [])
+
+    def test_uncertainty(self):
+        """A design outside the training envelope is flagged, with a larger uncertainty"""
+        model = SurrogateModel(get_records(40))
+        inside = model.predict([1.5] * len(FEATURE_NAMES))
+        outside = model.predict([1.5] * (len(FEATURE_NAMES) - 1) + [10.0])
+        self.assertEqual(inside.p_excess.shape, TIME_GRID.shape)
+        self.assertEqual(inside.std.shape, TIME_GRID.shape)
+        self.assertGreater(outside.std.max(), inside.std.max())
+        self.assertFalse(outside.in_envelope)
+        self.assertEqual(outside.outside_features, [FEATURE_NAMES[-1]])
+
+
+class TestResampleCurve(unittest.TestCase):
+    """Resampling of a curve on the common time grid"""
+
+    def test_resample_curve(self):
+        """The curve is interpolated, and the last value is held beyond the end of the curve"""
+        curve = resample_curve([0.0, 1.0, 100.0], [0.0, -10.0, -1.0])
+        self.assertEqual(curve.shape, TIME_GRID.shape)
+        self.assertEqual(curve[-1], -1.0)  # The last value is held beyond the end of the analysis
+        self.assertAlmostEqual(curve[0], -0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()